@@ -0,0 +1,231 @@
+"""
+asyncio engine behind the antenna scripts.
+
+One AntennaEngine polls one flrig: it reads the frequency every POLL_INTERVAL, on ticks
+SlotScheduler lines up with the WSJT-X slots, and when BandChangeDetector says so, reads back the rig
+state and sends whatever the rig policy needs, all without blocking. Between polls
+it just sleeps in the event loop. Given a hop schedule (see HopSchedule.py), it also
+applies the policy for the next band just before a predicted hop, and checks the hop
+against the polled frequency afterwards. The CLI runs one engine with asyncio.run(); the
+GUIs run theirs on an event loop in a worker thread and are told about every poll
+through on_update.
+"""
+import asyncio
+import time
+from datetime import datetime
+
+from AsyncFlrigClient import AsyncFlrigClient
+from BandPlan import default_band_plan
+from BandWatcher import POLL_INTERVAL, BandChangeDetector
+from HopSchedule import CONFIRM_SECONDS, PRESTAGE_SECONDS
+from Metrics import default_metrics
+from RigPolicy import PolicyEngine, RigPolicy
+from RigState import RigStateCache
+from SlotScheduler import SlotScheduler
+
+class AntennaEngine:
+    """Polls one flrig and applies a rig policy whenever the band changes."""
+
+    def __init__(self, client, policy, on_update=None, band_plan=None, poll_interval=POLL_INTERVAL, name=None, metrics=None,
+                 scheduler=None, hops=None):
+        self.client = client
+        self.policy_engine = PolicyEngine(policy)
+        self.rig_state = RigStateCache.for_policy(policy)
+        self.band_plan = band_plan or default_band_plan()
+        self.detector = BandChangeDetector(self.band_plan.band)
+        self.on_update = on_update
+        self.scheduler = scheduler or SlotScheduler(poll_interval)
+        self.hops = hops
+        self.prestaged = None  # (band, Unix time of the hop, band hopped from) while a pre-staged hop is unconfirmed
+        self.prestage_undone = False  # Whether a sync for another band has undone the pre-stage since
+        self.prestage_hits = 0
+        self.prestage_misses = 0
+        self.name = name or f"{client.host}:{client.port}"
+        self.metrics = metrics or default_metrics()
+
+        # What the last poll found, for display
+        self.frequency_mhz = None
+        self.band = None
+        self.status = "Unknown"  # Outcome of the last sync: "OK", "Out of Range" or "Switch Failed"
+        self.error = None  # Why the last poll failed, or None if it worked
+        self.last_poll_timestamp = "Never"
+        self.last_antenna_change_timestamp = "Never"
+
+    @classmethod
+    def for_script(cls, host, port, script, **kwargs):
+        """An engine for host:port using the policy shipped for script."""
+        return cls(AsyncFlrigClient(host, port), RigPolicy.for_script(script), **kwargs)
+
+    @property
+    def state(self):
+        """The rig state the policy has set, e.g. {"antenna": "ANT1", "preamp": "IPO"}."""
+        return self.policy_engine.state
+
+    def now(self):
+        return asyncio.get_running_loop().time()
+
+    async def poll(self):
+        """Reads just the frequency, the only call a poll makes while the band stays put."""
+        self.client.stats.begin_cycle()
+        self.metrics.count("antenna_polls_total", rig=self.name)
+        with self.metrics.timed("antenna_phase_seconds", phase="frequency_read", rig=self.name):
+            self.frequency_mhz = float(await self.client.call("rig.get_vfoA")) / 1e6
+        self.band = self.band_plan.band(self.frequency_mhz)
+        self.last_poll_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return self.frequency_mhz
+
+    async def read_back(self, fields):
+        """The verified values of fields, reading back the ones that have expired."""
+        now = self.now()
+        due = self.rig_state.due(fields, now)
+        if due:
+            drift = self.rig_state.drift
+            try:
+                with self.metrics.timed("antenna_phase_seconds", phase="state_read_back", rig=self.name):
+                    replies = await self.client.multicall(self.rig_state.read_calls(due))
+                self.rig_state.store(due, replies, now)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.rig_state.read_failed(due, e)
+            if self.rig_state.drift > drift:
+                self.metrics.count("antenna_drift_total", self.rig_state.drift - drift, rig=self.name)
+        return self.rig_state.current(fields)
+
+    async def sync(self, band_name=None):
+        """Brings the rig in line with the policy for band_name, by default the current band."""
+        band_name = band_name or self.band
+        start = time.perf_counter()
+        observed = await self.read_back(list(self.policy_engine.policy.desired(band_name) or {}))
+        read_back_seconds = time.perf_counter() - start
+        desired, changes = self.policy_engine.plan(band_name, observed)
+        if desired is None:
+            self.status = "Out of Range"
+            return
+
+        try:
+            for field, value in changes:
+                print(f"{self.name}: setting {field} to {value} for {band_name} at {self.frequency_mhz:.3f} MHz")
+
+            # All the commands for this poll are sent together
+            start = time.perf_counter()
+            if changes:
+                with self.metrics.timed("antenna_phase_seconds", phase="commands", rig=self.name):
+                    await self.client.multicall(self.policy_engine.commands(changes))
+                for field, value in changes:
+                    self.metrics.count("antenna_commands_total", field=field, rig=self.name)
+            commands_seconds = time.perf_counter() - start
+            self.policy_engine.applied(band_name, desired)
+            for field, value in changes:
+                self.rig_state.put(field, value, self.now())
+            if changes and self.prestaged and band_name != self.prestaged[0]:
+                self.prestage_undone = True
+            if any(field == "antenna" for field, value in changes):
+                self.last_antenna_change_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self.status = "OK"
+            if changes:
+                self.metrics.event("switch", rig=self.name, band=band_name, frequency_mhz=self.frequency_mhz,
+                                   changes=dict(changes), read_back_ms=round(read_back_seconds * 1000, 2),
+                                   commands_ms=round(commands_seconds * 1000, 2))
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"{self.name}: error applying {band_name} policy: {e}")
+            self.policy_engine.failed()
+            self.rig_state.invalidate()
+            self.status = "Switch Failed"
+            self.metrics.count("antenna_switch_errors_total", rig=self.name)
+            self.metrics.event("switch_failed", rig=self.name, band=band_name, error=str(e))
+
+    async def cycle(self):
+        """One poll, plus a sync when the band has changed or a resync is due."""
+        try:
+            frequency_mhz = await self.poll()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"{self.name}: error polling frequency: {e}")
+            self.error = str(e)
+            self.metrics.count("antenna_poll_errors_total", rig=self.name)
+        else:
+            self.error = None
+            band_changes = self.detector.band_changes
+            due = self.detector.observe(frequency_mhz, self.now())
+            if self.detector.band_changes > band_changes:
+                self.metrics.count("antenna_band_changes_total", rig=self.name)
+            if due:
+                with self.metrics.timed("antenna_phase_seconds", phase="switch", rig=self.name):
+                    await self.sync(self.prestaged_band())
+                self.detector.switched(self.now())
+                print(f"{self.name}: flrig round-trips: {self.client.stats.summary()}")
+                print(f"{self.name}: rig state: {self.rig_state.summary()}")
+                print(f"{self.name}: band watch: {self.detector.summary()}")
+                print(f"{self.name}: wakeups: {self.scheduler.summary()}")
+
+            if self.hops:
+                await self.prestage()
+
+        if self.on_update:
+            self.on_update(self)
+
+    async def prestage(self):
+        """
+        Applies the policy for the band the hop schedule says is next, PRESTAGE_SECONDS
+        before the hop, then confirms the hop against the polled band. If the rig is still
+        on the old band CONFIRM_SECONDS after the hop, the old band's policy is put back.
+        """
+        now = time.time()
+        self.hops.observe(self.band, now)
+        if self.prestaged:
+            band, when, from_band = self.prestaged
+            if self.band == band:
+                self.prestaged = None
+                if self.prestage_undone:
+                    # Something put the old band back before the hop, so the switch was made at the hop after all
+                    self.metrics.count("antenna_prestage_total", outcome="undone", rig=self.name)
+                else:
+                    self.prestage_hits += 1
+                    self.metrics.count("antenna_prestage_total", outcome="hit", rig=self.name)
+            elif self.band != from_band or now > when + CONFIRM_SECONDS:
+                self.prestaged = None
+                self.prestage_misses += 1
+                self.metrics.count("antenna_prestage_total", outcome="miss", rig=self.name)
+                print(f"{self.name}: predicted hop to {band} didn't happen; back to {self.band}")
+                await self.sync()
+            return
+
+        hop = self.hops.next_hop(now)
+        if hop is None:
+            return
+        when, band = hop
+        if band == self.band or when - now > PRESTAGE_SECONDS or self.policy_engine.policy.desired(band) is None:
+            return
+        print(f"{self.name}: pre-staging {band} for the hop in {when - now:.1f} s")
+        with self.metrics.timed("antenna_phase_seconds", phase="prestage", rig=self.name):
+            await self.sync(band)
+        if self.status == "OK":
+            self.prestaged = (band, when, self.band)
+            self.prestage_undone = False
+
+    def prestaged_band(self):
+        """
+        The pre-staged band while its hop is pending, so that a resync on the old band
+        before the hop keeps the pre-staged policy instead of undoing it; otherwise None.
+        """
+        if not self.prestaged:
+            return None
+        band, when, from_band = self.prestaged
+        if self.band != from_band or time.time() > when + CONFIRM_SECONDS:
+            return None
+        return band
+
+    async def run(self):
+        """Polls until cancelled, on the scheduler's ticks however long each poll takes."""
+        try:
+            while True:
+                await self.cycle()
+                lateness = await self.scheduler.wait()
+                self.metrics.observe("antenna_wakeup_lateness_seconds", lateness, rig=self.name)
+        finally:
+            self.client.close()
@@ -1,28 +1,53 @@
 import sys
-import time
+import asyncio
 import threading
-import xmlrpc.client
-from datetime import datetime
+from collections import namedtuple
+from PyQt5.QtCore import QTimer, pyqtSignal
 from PyQt5.QtWidgets import QApplication, QLabel, QVBoxLayout, QWidget
 
+from AntennaEngine import AntennaEngine
+from HopSchedule import hops_for
+from Metrics import default_metrics, start_metrics_server
+
 FLRIG_HOST = "127.0.0.1"  # Replace with your flrig host
 FLRIG_PORT = 12345           # Default flrig XML-RPC port
-server_url = f"http://{FLRIG_HOST}:{FLRIG_PORT}/RPC2"
+
+# Per-band antenna, preamp, power and split settings live in policies/<script>.json
+POLICY_NAME = "AntennaPortForBandGUI"
+
+# Set to "learn" to switch ahead of WSJT-X band hops predicted from the ones seen, or to a hop schedule file (see HopSchedule.py)
+HOP_SCHEDULE = None
+
+FRAME_MS = 16  # Snapshots arriving within one frame are shown in a single label update
+
+# What the labels show, published by the worker thread as one immutable snapshot per poll
+DisplayState = namedtuple("DisplayState", [
+    "frequency", "antenna_port", "last_poll_timestamp",
+    "last_antenna_change_timestamp", "flrig_latency", "band_watch",
+])
 
 class AntennaSwitchApp(QWidget):
+    # Carries DisplayState snapshots from the worker thread; Qt queues it onto the GUI thread
+    state_published = pyqtSignal(object)
+
     def __init__(self):
         super().__init__()
         self.init_ui()
 
-        # Initialize data
-        self.current_frequency = "Unknown"
-        self.current_antenna_port = "Unknown"
-        self.last_poll_timestamp = "Never"  # Renamed from last_change_timestamp
-        self.last_antenna_change_timestamp = "Never"  # New data attribute
-        self.client = None
+        # Initialize data: what the labels show now, and the newest snapshot not yet shown
+        self.shown_state = DisplayState("Unknown", "Unknown", "Never", "Never", "Unknown", "No band changes yet")
+        self.pending_state = None
+        self.repaint_timer = QTimer(self)
+        self.repaint_timer.setSingleShot(True)
+        self.repaint_timer.timeout.connect(self.update_gui)
+        self.state_published.connect(self.receive_state)
 
-        # Initialize flrig connection
-        self.initialize_flrig_connection()
+        self.metrics = default_metrics()
+        start_metrics_server(self.metrics)
+
+        # The engine polls flrig and switches; it calls engine_updated after every poll
+        self.engine = AntennaEngine.for_script(FLRIG_HOST, FLRIG_PORT, POLICY_NAME, on_update=self.engine_updated,
+                                                 hops=hops_for(HOP_SCHEDULE))
 
         # Start the worker thread for antenna switching
         self.start_worker_thread()
@@ -35,166 +60,87 @@ class AntennaSwitchApp(QWidget):
         self.antenna_label = QLabel("Current Antenna Port: Unknown")
         self.poll_timestamp_label = QLabel("Last Poll Timestamp: Never")  # Renamed
         self.change_timestamp_label = QLabel("Last Antenna Change Timestamp: Never")  # New GUI row
+        self.latency_label = QLabel("flrig Latency: Unknown")
+        self.band_watch_label = QLabel("Band Watch: No band changes yet")
+
+        self.init_label_fields()
 
         layout = QVBoxLayout()
         layout.addWidget(self.frequency_label)
         layout.addWidget(self.antenna_label)
         layout.addWidget(self.poll_timestamp_label)
         layout.addWidget(self.change_timestamp_label)  # Add new label to the layout
+        layout.addWidget(self.latency_label)
+        layout.addWidget(self.band_watch_label)
 
         self.setLayout(layout)
         self.resize(400, 200)
         self.show()
 
-    def initialize_flrig_connection(self):
-        """Initialize connection to flrig."""
-        try:
-            self.client = xmlrpc.client.ServerProxy(server_url)
-            print("Connected to flrig")
-        except Exception as e:
-            print(f"Error connecting to flrig: {e}")
-            self.client = None
-
-    def get_band_name(self, freq_mhz):
-        """Returns the band name for a given frequency in MHz."""
-        if 1.8 <= freq_mhz <= 2.0:
-            return "160m"
-        elif 3.5 <= freq_mhz <= 4.0:
-            return "80m"
-        elif 5.3 <= freq_mhz <= 5.4:
-            return "60m"
-        elif 7.0 <= freq_mhz <= 7.3:
-            return "40m"
-        elif 10.1 <= freq_mhz <= 10.15:
-            return "30m"
-        elif 14.0 <= freq_mhz <= 14.35:
-            return "20m"
-        elif 18.068 <= freq_mhz <= 18.168:
-            return "17m"
-        elif 21.0 <= freq_mhz <= 21.45:
-            return "15m"
-        elif 24.89 <= freq_mhz <= 24.99:
-            return "12m"
-        elif 28.0 <= freq_mhz <= 29.7:
-            return "10m"
-        elif 50.0 <= freq_mhz <= 54.0:
-            return "6m"
-        return None
-
-    def switch_antenna(self):
+    def init_label_fields(self):
+        """Which label shows each DisplayState field, and the text before its value."""
+        self.label_fields = {
+            "frequency": (self.frequency_label, "Current Frequency"),
+            "antenna_port": (self.antenna_label, "Current Antenna Port"),
+            "last_poll_timestamp": (self.poll_timestamp_label, "Last Poll Timestamp"),
+            "last_antenna_change_timestamp": (self.change_timestamp_label, "Last Antenna Change Timestamp"),
+            "flrig_latency": (self.latency_label, "flrig Latency"),
+            "band_watch": (self.band_watch_label, "Band Watch"),
+        }
+
+    def engine_updated(self, engine):
         """
-        Core logic to determine the frequency and switch antenna ports.
+        Runs on the worker thread after every poll: builds a snapshot of what the engine
+        found and publishes it to the GUI thread. It never touches a widget itself.
         """
-        try:
-            if self.client:
-                # Polling the current frequency
-                frequency_hz = float(self.client.rig.get_vfoA())
-                frequency_mhz = frequency_hz / 1e6
-                
-                band_name = self.get_band_name(frequency_mhz)
-                if band_name:
-                    self.current_frequency = f"{frequency_mhz:.3f} MHz ({band_name})"
-                else:
-                    self.current_frequency = f"{frequency_mhz:.3f} MHz"
-
-                # Update the poll timestamp
-                self.last_poll_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-                # --- 160m Logic (ANT2) ---
-                if 1.8 <= frequency_mhz <= 2.0:
-                    try:
-                        # Ensure Split is OFF
-                        if self.client.rig.get_split() != 0:
-                            self.client.rig.set_split(0)
-                        
-                        if self.current_antenna_port != "ANT2":
-                            self.client.rig.cmd(2) # ANT2
-                            self.current_antenna_port = "ANT2"
-                            self.last_antenna_change_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    except Exception as e:
-                        print(f"Error switching antenna (160m): {e}")
-                        self.current_antenna_port = "Switch Failed"
-
-                # --- 60m Special Logic ---
-                elif 5.3 <= frequency_mhz <= 5.4:
-                    try:
-                        # Ensure Split is OFF
-                        if self.client.rig.get_split() != 0:
-                            self.client.rig.set_split(0)
-                        
-                        if self.current_antenna_port != "ANT1":
-                            self.client.rig.cmd(1) # ANT1
-                            self.client.rig.cmd(6) # 15W
-                            self.last_antenna_change_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        
-                        self.current_antenna_port = "ANT1"
-                    except Exception as e:
-                        print(f"Error switching antenna/power (60m): {e}")
-                        self.current_antenna_port = "Switch Failed"
-
-                # --- Normal Logic (80m to 6m) ---
-                elif 3.5 <= frequency_mhz <= 54:
-                    try:
-                        # Ensure Split is OFF
-                        if self.client.rig.get_split() != 0:
-                            self.client.rig.set_split(0)
-
-                        if self.current_antenna_port != "ANT1":
-                            self.client.rig.cmd(1) # ANT1
-                            self.current_antenna_port = "ANT1"
-                            self.last_antenna_change_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        
-                    except Exception as e:
-                        print(f"Error switching antenna (Normal): {e}")
-                        self.current_antenna_port = "Switch Failed"
-
-                else:
-                    # Frequency is out of range
-                    self.current_antenna_port = "Out of Range"
-            else:
-                # flrig is not connected
-                self.current_frequency = "Unknown (flrig not connected)"
-                self.current_antenna_port = "Unknown (flrig not connected)"
-        except Exception as e:
-            print(f"Error during antenna switching: {e}")
-            self.current_frequency = "Error"
-            self.current_antenna_port = "Error"
-
-        # Update the GUI labels with the latest values
-        self.update_gui()
+        if engine.error:
+            frequency = "Error"
+        elif engine.frequency_mhz is None:
+            frequency = "Unknown"
+        elif engine.band:
+            frequency = f"{engine.frequency_mhz:.3f} MHz ({engine.band})"
+        else:
+            frequency = f"{engine.frequency_mhz:.3f} MHz"
+
+        if engine.status in ("Out of Range", "Switch Failed"):
+            antenna_port = engine.status
+        else:
+            antenna_port = engine.state.get("antenna", "Unknown")
+
+        stats = engine.client.stats
+        flrig_latency = f"{stats.cycle_total * 1000:.1f} ms in {stats.cycle_calls} calls" if stats.calls else "Unknown"
+        band_watch = engine.detector.summary() if engine.detector.band_changes else "No band changes yet"
+
+        self.state_published.emit(DisplayState(frequency, antenna_port,
+                                               engine.last_poll_timestamp, engine.last_antenna_change_timestamp,
+                                               flrig_latency, band_watch))
+
+    def receive_state(self, state):
+        """Keeps the newest snapshot; a burst of them within a frame costs one update."""
+        self.pending_state = state
+        if not self.repaint_timer.isActive():
+            self.repaint_timer.start(FRAME_MS)
 
     def update_gui(self):
-        """Updates the GUI with the latest frequency, antenna port, and timestamps."""
-        self.frequency_label.setText(f"Current Frequency: {self.current_frequency}")
-        self.antenna_label.setText(f"Current Antenna Port: {self.current_antenna_port}")
-        self.poll_timestamp_label.setText(f"Last Poll Timestamp: {self.last_poll_timestamp}")
-        self.change_timestamp_label.setText(f"Last Antenna Change Timestamp: {self.last_antenna_change_timestamp}")
+        """Updates just the labels whose values changed since they were last shown."""
+        state = self.pending_state
+        self.pending_state = None
+        if state is None:
+            return
+        with self.metrics.timed("antenna_phase_seconds", phase="gui_update", rig=self.engine.name):
+            for field, value in state._asdict().items():
+                if value != getattr(self.shown_state, field):
+                    label, caption = self.label_fields[field]
+                    label.setText(f"{caption}: {value}")
+        self.shown_state = state
 
     def start_worker_thread(self):
         """Starts the worker thread for the antenna switching loop."""
         threading.Thread(target=self.antenna_switching_loop, daemon=True).start()
 
     def antenna_switching_loop(self):
-        """Loop to switch antennas at :00.5, :15.5, :30.5, and :45.5 seconds."""
-        polling_times = [0, 15, 30, 45]  # Target times in seconds after the minute
-        while True:
-            now = datetime.now()
-            current_time = now.second + now.microsecond / 1_000_000.0
-
-            # Find the next target time (including the 0.5s offset)
-            # Target times are 0.5, 15.5, 30.5, 45.5
-            target_times = [t + 0.5 for t in polling_times]
-            
-            next_target = next((t for t in target_times if t > current_time), target_times[0])
-            
-            if next_target > current_time:
-                sleep_time = next_target - current_time
-            else:
-                # Wrap around to the next minute
-                sleep_time = 60.0 - current_time + next_target
-
-            time.sleep(sleep_time)
-            self.switch_antenna()
+        """Runs the engine, which polls every POLL_INTERVAL seconds and switches antennas as soon as the band changes."""
+        asyncio.run(self.engine.run())
 
 
 def main():
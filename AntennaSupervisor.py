@@ -0,0 +1,117 @@
+"""
+Runs the antenna engine for several radios from one process.
+
+The rigs are listed in a JSON file (rigs.json by default), each with its own flrig
+host and port and the policy to apply:
+
+    {"rigs": [
+        {"name": "FTdx3000", "host": "192.168.1.31", "port": 12345, "policy": "AntennaPortForBand"},
+        {"name": "Shack 2", "host": "192.168.1.40", "port": 12345, "policy": "my_policy.json"}
+    ]}
+
+"policy" is either the name of a file in policies/ or the path of a policy file,
+relative to the rigs file. An optional "hops" turns on switching ahead of WSJT-X band
+hops: "learn", or the path of a hop schedule file (see HopSchedule.py). All rigs are polled concurrently on one asyncio event
+loop, so dozens of rigs need no more threads than one, and their polls are spread
+evenly across each tick of the slot schedule rather than all landing at once. A combined status table,
+with each rig's flrig latency, is printed every STATUS_SECONDS.
+"""
+import argparse
+import asyncio
+import json
+import os
+
+from AntennaEngine import AntennaEngine
+from AsyncFlrigClient import AsyncFlrigClient
+from HopSchedule import hops_for
+from BandWatcher import POLL_INTERVAL
+from Metrics import METRICS_PORT, default_metrics, start_metrics_server
+from RigPolicy import RigPolicy
+
+RIGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rigs.json")
+STATUS_SECONDS = 10.0  # How often the combined status table is printed
+
+def load_policy(name, base_dir):
+    if name.endswith(".json"):
+        return RigPolicy.load(os.path.join(base_dir, name))
+    return RigPolicy.for_script(name)
+
+def load_rigs(path):
+    """One engine per rig in the rigs file."""
+    with open(path, "r") as f:
+        config = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    engines = []
+    names = set()
+    for rig in config["rigs"]:
+        name = rig.get("name") or f"{rig['host']}:{rig['port']}"
+        if name in names:
+            raise ValueError(f"{path}: rig name {name!r} is used twice")
+        names.add(name)
+        client = AsyncFlrigClient(rig["host"], rig["port"])
+        hops = rig.get("hops")
+        if hops and hops != "learn":
+            hops = os.path.join(base_dir, hops)
+        engines.append(AntennaEngine(client, load_policy(rig.get("policy", "AntennaPortForBand"), base_dir), name=name,
+                                     hops=hops_for(hops)))
+    return engines
+
+def format_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.1f}"
+
+def status_table(engines):
+    """The combined status of all rigs, one line each."""
+    rows = [("Rig", "Frequency", "Band", "Antenna", "Status", "Last poll", "Last ms", "p95 ms", "Errors")]
+    for engine in engines:
+        stats = engine.client.stats
+        if engine.error:
+            frequency = "Error"
+        elif engine.frequency_mhz is None:
+            frequency = "Unknown"
+        else:
+            frequency = f"{engine.frequency_mhz:.3f} MHz"
+        rows.append((engine.name, frequency, engine.band or "-", engine.state.get("antenna", "Unknown"),
+                     engine.status, engine.last_poll_timestamp, format_ms(stats.last),
+                     format_ms(stats.percentile(0.95)), str(stats.errors)))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return ["  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip() for row in rows]
+
+async def report_status(engines, interval):
+    while True:
+        await asyncio.sleep(interval)
+        print("\n".join(status_table(engines)))
+
+async def supervise(engines, status_seconds=STATUS_SECONDS):
+    """Polls every rig until cancelled, printing the status table as it goes."""
+    for i, engine in enumerate(engines):
+        # Each rig's ticks sit a little later in the period than the one before
+        engine.scheduler.offset += i * engine.scheduler.period / len(engines)
+    tasks = [engine.run() for engine in engines]
+    tasks.append(report_status(engines, status_seconds))
+    await asyncio.gather(*tasks)
+
+def main():
+    parser = argparse.ArgumentParser(description="Switch antennas for several flrig-controlled radios from one process.")
+    parser.add_argument("--rigs", default=RIGS_PATH, help=f"JSON file listing the rigs (default {RIGS_PATH}).")
+    parser.add_argument("--statusSeconds", type=float, default=STATUS_SECONDS,
+                        help=f"Seconds between status tables (default {STATUS_SECONDS}).")
+    parser.add_argument("--metricsPort", type=int, default=METRICS_PORT,
+                        help=f"Port for the Prometheus metrics endpoint (default {METRICS_PORT}, 0 = off).")
+    parser.add_argument("--metricsLog", help="Also write every switch as a JSON line to this rotating log file.")
+    args = parser.parse_args()
+
+    metrics = default_metrics()
+    if args.metricsLog:
+        metrics.enable_log(args.metricsLog)
+    if args.metricsPort:
+        start_metrics_server(metrics, port=args.metricsPort)
+
+    engines = load_rigs(args.rigs)
+    print(f"Supervising {len(engines)} rigs, polling each every {POLL_INTERVAL} s.")
+    try:
+        asyncio.run(supervise(engines, args.statusSeconds))
+    except KeyboardInterrupt:
+        print("Stopped.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Non-blocking XML-RPC client for flrig, for use from asyncio.
+
+It speaks XML-RPC to flrig over one kept-alive HTTP/1.1 connection, on asyncio
+streams, so a single thread can poll several flrig instances at once
+and sit idle between polls. Timeouts are asyncio timeouts: a call that is cancelled
+or times out closes the connection, and the next call reconnects.
+"""
+import asyncio
+import time
+import xmlrpc.client
+
+from LatencyStats import LatencyStats
+from Metrics import default_metrics
+
+CONNECT_TIMEOUT = 2.0  # Seconds to wait for flrig to accept the connection
+READ_TIMEOUT = 2.0     # Seconds to wait for a reply once connected
+
+async def with_timeout(awaitable, seconds):
+    """
+    Awaits with a timeout. asyncio.wait_for before Python 3.12 can swallow a
+    cancellation that arrives just as the call completes, which would leave an engine
+    running after it was told to stop, so asyncio.timeout is used where it exists.
+    """
+    if hasattr(asyncio, "timeout"):
+        async with asyncio.timeout(seconds):
+            return await awaitable
+    return await asyncio.wait_for(awaitable, seconds)
+
+class AsyncFlrigClient:
+    """
+    flrig client whose calls are coroutines: await client.call("rig.get_vfoA").
+
+    Calls on one client are sent one at a time, since they share a connection;
+    use one client per flrig to run them concurrently.
+    """
+
+    def __init__(self, host, port, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, metrics=None):
+        self.host = host
+        self.port = port
+        self.address = f"{host}:{port}"
+        self.metrics = metrics or default_metrics()
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.stats = LatencyStats()
+        self.reader = None
+        self.writer = None
+        self.lock = asyncio.Lock()
+        self.multicall_supported = None  # Unknown until the first multicall
+
+    async def connect(self):
+        self.reader, self.writer = await with_timeout(
+            asyncio.open_connection(self.host, self.port), self.connect_timeout)
+
+    async def exchange(self, body):
+        """Send one request on the open connection and return the response body."""
+        self.writer.write(
+            f"POST /RPC2 HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            f"Content-Type: text/xml\r\nContent-Length: {len(body)}\r\n\r\n".encode("ascii") + body)
+        await self.writer.drain()
+
+        status = await self.reader.readline()
+        if not status:
+            raise ConnectionResetError("flrig closed the connection")
+        parts = status.split(None, 2)
+        if len(parts) < 2 or parts[1] != b"200":
+            raise xmlrpc.client.ProtocolError(f"{self.host}:{self.port}/RPC2", int(parts[1]) if len(parts) > 1 else 0,
+                                              status.decode("latin-1").strip(), {})
+        length = None
+        keep_alive = True
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "connection" and value.strip().lower() == "close":
+                keep_alive = False
+        if length is None:
+            response = await self.reader.read()
+            keep_alive = False
+        else:
+            response = await self.reader.readexactly(length)
+        if not keep_alive:
+            self.close()
+        return response
+
+    async def request(self, body, method):
+        async with self.lock:
+            start = time.perf_counter()
+            for attempt in (0, 1):
+                reused = self.writer is not None
+                try:
+                    if not reused:
+                        await self.connect()
+                    response = await with_timeout(self.exchange(body), self.read_timeout)
+                    break
+                except (ConnectionError, asyncio.IncompleteReadError) as e:
+                    self.close()
+                    # A kept-alive connection flrig has since dropped: reconnect and try once more
+                    if reused and attempt == 0:
+                        continue
+                    self.stats.record_error()
+                    self.metrics.count("flrig_errors_total", method=method, flrig=self.address)
+                    raise
+                except BaseException:
+                    # Timeouts and cancellation leave the connection mid-request
+                    self.close()
+                    self.stats.record_error()
+                    self.metrics.count("flrig_errors_total", method=method, flrig=self.address)
+                    raise
+            elapsed = time.perf_counter() - start
+            self.stats.record(elapsed)
+            self.metrics.observe("flrig_call_seconds", elapsed, method=method, flrig=self.address)
+        try:
+            return xmlrpc.client.loads(response)[0]
+        except xmlrpc.client.Fault:
+            self.metrics.count("flrig_errors_total", method=method, flrig=self.address)
+            raise
+
+    async def call(self, method, *args):
+        """Call one flrig method and return its result. A fault raises xmlrpc.client.Fault."""
+        result = await self.request(xmlrpc.client.dumps(args, method).encode("utf-8"), method)
+        return result[0]
+
+    async def multicall(self, calls):
+        """
+        Make several calls, given as [(method, args), ...], and return their results in order.
+
+        They go in one system.multicall round-trip when flrig supports it, and one
+        after another otherwise. A call that fails raises its Fault.
+        """
+        if not calls:
+            return []
+        if self.multicall_supported is not False:
+            batch = [{"methodName": method, "params": list(args)} for method, args in calls]
+            try:
+                results = await self.call("system.multicall", batch)
+                self.multicall_supported = True
+            except xmlrpc.client.Fault as e:
+                if self.multicall_supported:
+                    raise
+                print(f"flrig doesn't support system.multicall ({e.faultString}); making calls one at a time.")
+                self.multicall_supported = False
+            else:
+                for result in results:
+                    if isinstance(result, dict):
+                        raise xmlrpc.client.Fault(result.get("faultCode"), result.get("faultString"))
+                return [result[0] for result in results]
+        return [await self.call(method, *args) for method, args in calls]
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = None
+        self.writer = None
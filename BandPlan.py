@@ -0,0 +1,62 @@
+"""
+Band plan lookup shared by the antenna scripts and the PSK Reporter uploader.
+
+Bands are loaded from bandplans/iaru_region<N>.json as sorted, non-overlapping
+frequency intervals and looked up with bisect.
+"""
+import json
+import os
+from bisect import bisect_right
+
+IARU_REGION = 2  # 1 = Europe/Africa/Middle East, 2 = the Americas, 3 = Asia-Pacific
+BAND_PLAN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bandplans")
+
+class BandPlan:
+    """
+    Maps a frequency in MHz to a band name.
+
+    Lookups bisect the sorted band edges, and the last band found is checked first:
+    a rig usually sits on one band for many polls, so most lookups cost one range
+    comparison.
+    """
+
+    def __init__(self, bands):
+        """bands is an iterable of (name, low_mhz, high_mhz); edges are inclusive."""
+        bands = sorted(bands, key=lambda band: band[1])
+        for (name, low, high), (next_name, next_low, _) in zip(bands, bands[1:]):
+            if next_low <= high:
+                raise ValueError(f"Bands {name} and {next_name} overlap")
+        self.names = [name for name, _, _ in bands]
+        self.lows = [low for _, low, _ in bands]
+        self.highs = [high for _, _, high in bands]
+        self.last = None  # (low, high, name) of the last hit
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            plan = json.load(f)
+        return cls((band["name"], band["low"], band["high"]) for band in plan["bands"])
+
+    @classmethod
+    def for_region(cls, region=IARU_REGION):
+        return cls.load(os.path.join(BAND_PLAN_DIR, f"iaru_region{region}.json"))
+
+    def band(self, frequency_mhz):
+        """The band frequency_mhz falls in, or None if it is outside every band."""
+        last = self.last
+        if last and last[0] <= frequency_mhz <= last[1]:
+            return last[2]
+        i = bisect_right(self.lows, frequency_mhz) - 1
+        if i >= 0 and frequency_mhz <= self.highs[i]:
+            self.last = (self.lows[i], self.highs[i], self.names[i])
+            return self.names[i]
+        return None
+
+_default = None
+
+def default_band_plan():
+    """The band plan for IARU_REGION, loaded on first use."""
+    global _default
+    if _default is None:
+        _default = BandPlan.for_region()
+    return _default
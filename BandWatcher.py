@@ -0,0 +1,68 @@
+"""
+Band-change detection for the antenna scripts.
+
+flrig has no way to push change notifications over XML-RPC, so the scripts poll
+rig.get_vfoA, which is cheap, at a high rate and only do the full switching work
+when the band has actually changed, plus a periodic resync.
+"""
+import time
+
+from LatencyStats import LatencyStats
+
+POLL_INTERVAL = 0.5    # Seconds between frequency polls
+RESYNC_SECONDS = 15.0  # Run the full switching logic at least this often, even without a band change
+
+class BandChangeDetector:
+    """
+    Follows the band across frequency polls and says when switching is needed.
+
+    It does no I/O: feed it each polled frequency with observe(), and call switched()
+    once the antenna has been switched. The switch latency it records is measured from
+    the last poll that still showed the old band, so it is an upper bound on how long
+    the wrong antenna could have been selected after a band change.
+    """
+
+    def __init__(self, band_for_frequency, resync_seconds=RESYNC_SECONDS):
+        self.band_for_frequency = band_for_frequency
+        self.resync_seconds = resync_seconds
+        self.band = None
+        self.known = False  # No frequency seen yet
+        self.last_poll_at = None
+        self.change_started_at = None
+        self.last_sync_at = None
+        self.band_changes = 0
+        self.latency = LatencyStats()
+
+    def observe(self, frequency_mhz, now=None):
+        """
+        Record a polled frequency. Returns True when switching should run now: on the
+        first poll, when the band has changed, or when the resync interval is up.
+        """
+        if now is None:
+            now = time.monotonic()
+        band = self.band_for_frequency(frequency_mhz)
+        changed = not self.known or band != self.band
+        if changed:
+            if self.known:
+                self.band_changes += 1
+                self.change_started_at = self.last_poll_at
+            self.band = band
+            self.known = True
+        self.last_poll_at = now
+        due = self.last_sync_at is None or now - self.last_sync_at >= self.resync_seconds
+        return changed or due
+
+    def switched(self, now=None):
+        """Record that switching has run for the current band."""
+        if now is None:
+            now = time.monotonic()
+        if self.change_started_at is not None:
+            self.latency.record(now - self.change_started_at)
+            self.change_started_at = None
+        self.last_sync_at = now
+
+    def summary(self):
+        if not self.latency.calls:
+            return f"{self.band_changes} band changes"
+        return (f"{self.band_changes} band changes, last switch within {self.latency.last * 1000:.0f} ms, "
+                f"worst {self.latency.max * 1000:.0f} ms")
@@ -0,0 +1,188 @@
+"""
+A stand-in for flrig, for trying the antenna scripts without a radio.
+
+It serves the XML-RPC calls the scripts use (rig.get_vfoA, rig.get_split,
+rig.set_split, rig.cmd, rig.get_power and rig.cat_string, plus system.multicall)
+and keeps a small model of the radio: pressing User Button 1, 2 or 9 selects ANT1,
+ANT2 or ANTR3/2, 10 and 12 select the IPO and AMP2 preamp settings, and 6 sets 15W.
+AN0; and PA0; CAT queries are answered from the same model, the way a Yaesu would.
+
+Every request can be delayed (--latency, --jitter) and individual calls can be made
+to fail (--failRate), so latency and throughput of the polling and switching paths
+can be measured reproducibly offline. Point a script's FLRIG_HOST/FLRIG_PORT at it:
+
+    python3 FakeFlrig.py --port 12345 --latency 5 --hopSeconds 10
+"""
+import argparse
+import random
+import threading
+import time
+import xmlrpc.client
+from socketserver import ThreadingMixIn
+from xmlrpc.server import SimpleXMLRPCRequestHandler, SimpleXMLRPCServer
+
+FAKE_HOST = "127.0.0.1"
+FAKE_PORT = 12345
+
+# What each User Button does to the model: (field, value)
+BUTTONS = {
+    1: ("antenna", "ANT1"),
+    2: ("antenna", "ANT2"),
+    9: ("antenna", "ANTR3/2"),
+    10: ("preamp", "IPO"),
+    12: ("preamp", "AMP2"),
+    6: ("power", 15),
+}
+
+# CAT replies for the model's antenna and preamp, as a Yaesu sends them
+ANTENNA_REPLIES = {"ANT1": "AN01;", "ANT2": "AN02;", "ANTR3/2": "AN03;"}
+PREAMP_REPLIES = {"IPO": "PA00;", "AMP1": "PA01;", "AMP2": "PA02;"}
+
+# Frequencies --hopSeconds cycles through, in Hz
+HOP_FREQUENCIES = (14074000, 7074000, 1840000, 5357000, 3573000, 28074000, 50313000)
+
+class FakeRig:
+    """The radio state behind the fake server. Calls from concurrent requests are serialized."""
+
+    def __init__(self, frequency_hz=HOP_FREQUENCIES[0]):
+        self.lock = threading.Lock()
+        self.frequency_hz = frequency_hz
+        self.split = 0
+        self.antenna = "ANT1"
+        self.preamp = "IPO"
+        self.power = 100
+        self.commands = 0  # rig.cmd and rig.set_split calls, i.e. things that changed the rig
+
+    def get_vfoA(self):
+        with self.lock:
+            return str(self.frequency_hz)
+
+    def set_vfoA(self, frequency_hz):
+        with self.lock:
+            self.frequency_hz = int(float(frequency_hz))
+        return 0
+
+    def get_split(self):
+        with self.lock:
+            return self.split
+
+    def set_split(self, split):
+        with self.lock:
+            self.split = int(split)
+            self.commands += 1
+        return 0
+
+    def get_power(self):
+        with self.lock:
+            return self.power
+
+    def cmd(self, button):
+        with self.lock:
+            self.commands += 1
+            if button in BUTTONS:
+                field, value = BUTTONS[button]
+                setattr(self, field, value)
+        return 0
+
+    def cat_string(self, command):
+        with self.lock:
+            if command == "AN0;":
+                return ANTENNA_REPLIES[self.antenna]
+            if command == "PA0;":
+                return PREAMP_REPLIES[self.preamp]
+        return "?;"
+
+class KeepAliveHandler(SimpleXMLRPCRequestHandler):
+    # flrig keeps HTTP/1.1 connections open, and AsyncFlrigClient relies on that
+    protocol_version = "HTTP/1.1"
+    rpc_paths = ("/RPC2", "/")
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeFlrig(ThreadingMixIn, SimpleXMLRPCServer):
+    """
+    XML-RPC server for a FakeRig. Each request waits latency plus up to jitter seconds,
+    and each call within it fails with a Fault with probability fail_rate.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host=FAKE_HOST, port=FAKE_PORT, rig=None, latency=0.0, jitter=0.0, fail_rate=0.0, seed=None):
+        super().__init__((host, port), requestHandler=KeepAliveHandler, logRequests=False, allow_none=True)
+        self.rig = rig or FakeRig()
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.calls = 0
+        self.failures = 0
+        self.register_multicall_functions()
+        for name in ("get_vfoA", "set_vfoA", "get_split", "set_split", "get_power", "cmd", "cat_string"):
+            self.register_function(getattr(self.rig, name), f"rig.{name}")
+
+    def _marshaled_dispatch(self, data, dispatch_method=None, path=None):
+        # Once per HTTP request, however many calls a multicall carries
+        self.requests += 1
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        return super()._marshaled_dispatch(data, dispatch_method, path)
+
+    def _dispatch(self, method, params):
+        if method != "system.multicall":
+            self.calls += 1
+            if self.fail_rate and self.random.random() < self.fail_rate:
+                self.failures += 1
+                raise xmlrpc.client.Fault(1, f"injected failure in {method}")
+        return super()._dispatch(method, params)
+
+    def start(self):
+        """Serves on a daemon thread and returns (host, port), for use from a test or benchmark."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.server_address
+
+    def summary(self):
+        rig = self.rig
+        return (f"{self.requests} requests, {self.calls} calls, {self.failures} injected failures, "
+                f"{rig.commands} commands; {rig.frequency_hz / 1e6:.3f} MHz, {rig.antenna}, {rig.preamp}, "
+                f"{rig.power} W, split {rig.split}")
+
+def hop_bands(rig, seconds):
+    """Moves the fake VFO to the next of HOP_FREQUENCIES every seconds, like a band-hopping WSJT-X."""
+    index = 0
+    while True:
+        time.sleep(seconds)
+        index = (index + 1) % len(HOP_FREQUENCIES)
+        rig.set_vfoA(HOP_FREQUENCIES[index])
+        print(f"Hopped to {HOP_FREQUENCIES[index] / 1e6:.3f} MHz")
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake flrig over XML-RPC for testing the antenna scripts.")
+    parser.add_argument("--host", default=FAKE_HOST, help=f"Address to listen on (default {FAKE_HOST}).")
+    parser.add_argument("--port", type=int, default=FAKE_PORT, help=f"Port to listen on (default {FAKE_PORT}).")
+    parser.add_argument("--frequency", type=float, default=HOP_FREQUENCIES[0] / 1e6, help="Starting VFO A frequency in MHz.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Milliseconds to wait before answering each request.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra milliseconds per request, at random.")
+    parser.add_argument("--failRate", type=float, default=0.0, help="Fraction of calls to answer with a fault (0-1).")
+    parser.add_argument("--hopSeconds", type=float, default=0.0, help="Change band this often (0 = never).")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed, for repeatable jitter and failures.")
+    args = parser.parse_args()
+
+    rig = FakeRig(int(args.frequency * 1e6))
+    server = FakeFlrig(args.host, args.port, rig, args.latency / 1000, args.jitter / 1000, args.failRate, args.seed)
+    if args.hopSeconds:
+        threading.Thread(target=hop_bands, args=(rig, args.hopSeconds), daemon=True).start()
+
+    print(f"Fake flrig listening on {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Stopped: {server.summary()}")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Where WSJT-X band hopping goes next, so the antenna can be switched before the hop.
+
+A HopSchedule is loaded from a JSON file listing which band starts at which point of a
+repeating period, in UTC:
+
+    {"period_minutes": 60,
+     "hops": [{"at": "00:00", "band": "160m"}, {"at": "10:00", "band": "80m"}, {"at": "20:00", "band": "40m"}]}
+
+"at" is minutes:seconds into the period, counted from the top of the UTC hour (the
+period must divide a day). A HopLearner needs no file: it watches the band changes the
+engine sees and, once the rig has gone from one band to the same next band after the
+same dwell LEARN_REPEATS times running, predicts that hop from then on. Both give
+next_hop(now) -> (when, band), or None when there is nothing to predict.
+"""
+import json
+import math
+
+from SlotScheduler import SLOT_SECONDS
+
+LEARN_REPEATS = 2  # Times a hop must repeat before it is predicted
+PRESTAGE_SECONDS = 1.0  # Switch this long before a predicted hop, in the quiet end of the last slot
+CONFIRM_SECONDS = 5.0   # A predicted hop flrig hasn't shown by this long after it is a miss
+
+class HopSchedule:
+    """Bands that start at fixed offsets in a repeating period."""
+
+    def __init__(self, period_seconds, hops):
+        """hops is an iterable of (offset_seconds, band)."""
+        if period_seconds <= 0 or 86400 % period_seconds:
+            raise ValueError(f"period of {period_seconds} s doesn't divide a day")
+        self.period_seconds = period_seconds
+        self.hops = sorted(hops)
+        if not self.hops:
+            raise ValueError("no hops")
+        for offset, band in self.hops:
+            if not 0 <= offset < period_seconds:
+                raise ValueError(f"hop to {band} at {offset} s is outside the {period_seconds} s period")
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            config = json.load(f)
+        hops = []
+        for hop in config["hops"]:
+            minutes, _, seconds = hop["at"].partition(":")
+            hops.append((int(minutes) * 60 + float(seconds or 0), hop["band"]))
+        return cls(config["period_minutes"] * 60, hops)
+
+    def observe(self, band, now):
+        """The schedule is fixed; band changes seen don't alter it."""
+
+    def next_hop(self, now):
+        """(Unix time, band) of the first hop after now."""
+        start = math.floor(now / self.period_seconds) * self.period_seconds
+        for offset, band in self.hops:
+            if start + offset > now:
+                return start + offset, band
+        offset, band = self.hops[0]
+        return start + self.period_seconds + offset, band
+
+class HopLearner:
+    """
+    Predicts hops from the ones seen: after dwelling so long on one band, the rig went to
+    another. Hops happen at slot boundaries, so times are rounded down to the slot.
+    """
+
+    def __init__(self, slot_seconds=SLOT_SECONDS, repeats=LEARN_REPEATS):
+        self.slot_seconds = slot_seconds
+        self.repeats = repeats
+        self.seen = False
+        self.band = None
+        self.since = None  # Slot the current band started in; None until a hop has been seen
+        self.transitions = {}  # band -> (next band, dwell seconds, times seen in a row)
+
+    def observe(self, band, now):
+        """Record the band polled at Unix time now."""
+        if self.seen and band == self.band:
+            return
+        slot_start = math.floor(now / self.slot_seconds) * self.slot_seconds
+        if self.since is not None:
+            dwell = slot_start - self.since
+            next_band, last_dwell, count = self.transitions.get(self.band, (None, None, 0))
+            if (next_band, last_dwell) == (band, dwell):
+                count += 1
+            else:
+                count = 1
+            self.transitions[self.band] = (band, dwell, count)
+        # The first band's start wasn't seen, so its dwell can't be learned
+        self.since = slot_start if self.seen else None
+        self.seen = True
+        self.band = band
+
+    def next_hop(self, now):
+        if self.since is None or self.band not in self.transitions:
+            return None
+        band, dwell, count = self.transitions[self.band]
+        when = self.since + dwell
+        if count < self.repeats or when <= now:
+            return None
+        return when, band
+
+def hops_for(setting, slot_seconds=SLOT_SECONDS):
+    """What a script's HOP_SCHEDULE setting asks for: None, "learn", or the path of a schedule file."""
+    if not setting:
+        return None
+    if setting == "learn":
+        return HopLearner(slot_seconds)
+    return HopSchedule.load(setting)
@@ -0,0 +1,289 @@
+"""
+A stand-in for the PSK Reporter collector, for checking what WSJTXToPSKReporter sends.
+
+It receives IPFIX packets over UDP, learns templates from their template sets and
+decodes data records against them, variable-length strings included. Anything that
+doesn't add up is reported as a problem: a wrong version, a header length that isn't
+the datagram's, a set or record running past its end, a data set for a template not
+yet seen, or a sequence number that skips or repeats (the uploader numbers every
+packet, template packets included). It also counts records per second and bytes per
+record, so packing and encoder changes can be measured end to end on one machine:
+
+    python3 IPFIXCollector.py --port 14739 --verbose
+    python3 WSJTXToPSKReporter.py --batch --server 127.0.0.1:14739
+"""
+import argparse
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from socketserver import BaseRequestHandler, UDPServer
+
+from WSJTXToPSKReporter import (ENTERPRISE_ID, FIELD_FLOW_START_SECONDS, FIELD_FREQUENCY, FIELD_MODE,
+                                FIELD_RECEIVER_ANTENNA, FIELD_RECEIVER_CALLSIGN, FIELD_RECEIVER_LOCATOR,
+                                FIELD_RECEIVER_RIG, FIELD_REPORTING_SOFTWARE, FIELD_REPORTING_SOFTWARE_VERSION,
+                                FIELD_SENDER_CALLSIGN, FIELD_SENDER_LOCATOR, TEMPLATE_SET_ID)
+
+COLLECTOR_HOST = "127.0.0.1"
+COLLECTOR_PORT = 14739  # PSK Reporter's test port
+RECEIVE_BUFFER_BYTES = 4 * 1024 * 1024  # Room for a burst from a sender that isn't paced
+RECENT_PROBLEMS = 20
+VARIABLE_LENGTH = 65535
+OPTIONS_TEMPLATE_SET_ID = 3
+
+HEADER = struct.Struct(">HHIII")
+SET_HEADER = struct.Struct(">HH")
+
+# (enterprise, field ID) -> name; enterprise is None for IANA fields
+FIELD_NAMES = {
+    (ENTERPRISE_ID, FIELD_SENDER_CALLSIGN): "sender_callsign",
+    (ENTERPRISE_ID, FIELD_RECEIVER_CALLSIGN): "receiver_callsign",
+    (ENTERPRISE_ID, FIELD_RECEIVER_ANTENNA): "receiver_antenna",
+    (ENTERPRISE_ID, FIELD_RECEIVER_LOCATOR): "receiver_locator",
+    (ENTERPRISE_ID, FIELD_FREQUENCY): "frequency",
+    (ENTERPRISE_ID, FIELD_RECEIVER_RIG): "receiver_rig",
+    (ENTERPRISE_ID, FIELD_SENDER_LOCATOR): "sender_locator",
+    (ENTERPRISE_ID, FIELD_MODE): "mode",
+    (ENTERPRISE_ID, FIELD_REPORTING_SOFTWARE): "software",
+    (ENTERPRISE_ID, FIELD_REPORTING_SOFTWARE_VERSION): "software_version",
+    (None, FIELD_FLOW_START_SECONDS): "timestamp",
+}
+
+class MalformedPacket(ValueError):
+    pass
+
+def parse_template_set(data, offset, end):
+    """
+    Template records in data[offset:end], as {template_id: [(name, length), ...]}.
+    A template with no fields withdraws that template ID, and maps to an empty list.
+    """
+    templates = {}
+    while end - offset >= 4:
+        template_id, field_count = SET_HEADER.unpack_from(data, offset)
+        offset += 4
+        if template_id < 256:
+            raise MalformedPacket(f"template ID {template_id} is below 256")
+        fields = []
+        for _ in range(field_count):
+            if offset + 4 > end:
+                raise MalformedPacket(f"template {template_id} runs past the end of its set")
+            field_id, length = SET_HEADER.unpack_from(data, offset)
+            offset += 4
+            enterprise = None
+            if field_id & 0x8000:
+                if offset + 4 > end:
+                    raise MalformedPacket(f"template {template_id} runs past the end of its set")
+                enterprise, = struct.unpack_from(">I", data, offset)
+                offset += 4
+                field_id &= 0x7FFF
+            fields.append((FIELD_NAMES.get((enterprise, field_id), f"{enterprise or 'iana'}.{field_id}"), length))
+        templates[template_id] = fields
+    return templates
+
+def read_string(data, offset, end):
+    """A variable-length field at offset: a length byte, or 255 and a 16-bit length, then the bytes."""
+    if offset >= end:
+        raise MalformedPacket("string length runs past the end of its set")
+    length = data[offset]
+    offset += 1
+    if length == 255:
+        if offset + 2 > end:
+            raise MalformedPacket("string length runs past the end of its set")
+        length, = struct.unpack_from(">H", data, offset)
+        offset += 2
+    if offset + length > end:
+        raise MalformedPacket(f"{length}-byte string runs past the end of its set")
+    return data[offset:offset + length].decode("utf-8", "replace"), offset + length
+
+def decode_record(data, offset, end, fields):
+    """One data record at offset. Returns (dict of field name -> value, offset past it)."""
+    record = {}
+    for name, length in fields:
+        if length == VARIABLE_LENGTH:
+            record[name], offset = read_string(data, offset, end)
+        else:
+            if offset + length > end:
+                raise MalformedPacket(f"{length}-byte field {name} runs past the end of its set")
+            record[name] = int.from_bytes(data[offset:offset + length], "big")
+            offset += length
+    return record, offset
+
+def decode_packet(data, templates):
+    """
+    Decode one IPFIX message, learning any templates it carries into templates.
+
+    Returns (header, records), header being (version, length, export_time, sequence,
+    domain). Raises MalformedPacket at the first thing that doesn't fit.
+    """
+    if len(data) < HEADER.size:
+        raise MalformedPacket(f"{len(data)} bytes is too short for an IPFIX header")
+    header = HEADER.unpack_from(data, 0)
+    version, length = header[0], header[1]
+    if version != 10:
+        raise MalformedPacket(f"version {version}, not 10")
+    if length != len(data):
+        raise MalformedPacket(f"header says {length} bytes, datagram has {len(data)}")
+
+    records = []
+    offset = HEADER.size
+    while offset < length:
+        if offset + SET_HEADER.size > length:
+            raise MalformedPacket(f"{length - offset} bytes left over after the last set")
+        set_id, set_length = SET_HEADER.unpack_from(data, offset)
+        end = offset + set_length
+        if set_length < SET_HEADER.size or end > length:
+            raise MalformedPacket(f"set {set_id} length {set_length} doesn't fit at offset {offset}")
+        offset += SET_HEADER.size
+        if set_id == TEMPLATE_SET_ID:
+            for template_id, fields in parse_template_set(data, offset, end).items():
+                if fields:
+                    templates[template_id] = fields
+                else:
+                    templates.pop(template_id, None)
+        elif set_id >= 256:
+            fields = templates.get(set_id)
+            if fields is None:
+                raise MalformedPacket(f"data set for template {set_id}, which hasn't been received")
+            while offset < end:
+                if data[offset] == 0 and not any(data[offset:end]):
+                    break  # Padding
+                record, next_offset = decode_record(data, offset, end, fields)
+                if next_offset == offset:
+                    # Only zero-length fields: nothing would ever move the decoder on
+                    raise MalformedPacket(f"template {set_id} records take no bytes")
+                offset = next_offset
+                records.append(record)
+        elif set_id != OPTIONS_TEMPLATE_SET_ID:
+            raise MalformedPacket(f"set ID {set_id} is reserved")
+        offset = end
+    return header, records
+
+class CollectorHandler(BaseRequestHandler):
+    def handle(self):
+        self.server.receive(self.request[0], self.client_address)
+
+class IPFIXCollector(UDPServer):
+    """
+    Decodes every datagram sent to it and keeps counts. Templates and sequence numbers
+    are tracked per sender address and observation domain, as a real collector would.
+    """
+
+    allow_reuse_address = True
+
+    def __init__(self, host=COLLECTOR_HOST, port=COLLECTOR_PORT, keep_records=False, verbose=False):
+        super().__init__((host, port), CollectorHandler)
+        try:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_BYTES)
+        except OSError:
+            pass
+        self.verbose = verbose
+        self.records = [] if keep_records else None
+        self.lock = threading.Lock()
+        self.templates = {}  # (address, domain) -> {template_id: fields}
+        self.next_sequence = {}  # (address, domain) -> the sequence number expected next
+        self.packets = 0
+        self.bytes = 0
+        self.record_count = 0
+        self.template_packets = 0
+        self.malformed = 0
+        self.gaps = 0
+        self.missing = 0
+        self.problems = deque(maxlen=RECENT_PROBLEMS)
+        self.first_at = None
+        self.last_at = None
+
+    def receive(self, data, address):
+        now = time.monotonic()
+        with self.lock:
+            self.packets += 1
+            self.bytes += len(data)
+            self.first_at = self.first_at or now
+            self.last_at = now
+            domain = struct.unpack_from(">I", data, 12)[0] if len(data) >= HEADER.size else 0
+            key = (address, domain)
+            try:
+                _, records = decode_packet(data, self.templates.setdefault(key, {}))
+            except MalformedPacket as e:
+                self.problem(f"{address[0]}:{address[1]}: malformed packet: {e}")
+                self.malformed += 1
+                return
+            self.check_sequence(key, HEADER.unpack_from(data, 0)[3])
+            if not records:
+                self.template_packets += 1
+            self.record_count += len(records)
+            if self.records is not None:
+                self.records.extend(records)
+        if self.verbose:
+            for record in records:
+                print(", ".join(f"{name}={value}" for name, value in record.items()))
+
+    def check_sequence(self, key, sequence):
+        expected = self.next_sequence.get(key)
+        if expected is not None and sequence != expected:
+            self.gaps += 1
+            missing = (sequence - expected) & 0xFFFFFFFF
+            if missing < 0x80000000:
+                self.missing += missing
+                self.problem(f"sequence gap: expected {expected}, got {sequence} ({missing} packets missing)")
+            else:
+                self.problem(f"sequence went back: expected {expected}, got {sequence}")
+        self.next_sequence[key] = (sequence + 1) & 0xFFFFFFFF
+
+    def problem(self, text):
+        self.problems.append(text)
+        if self.verbose:
+            print(text)
+
+    def start(self):
+        """Serves on a daemon thread and returns (host, port), for use from a test or benchmark."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.server_address
+
+    def wait_for(self, packets, timeout=5.0):
+        """Wait until at least packets datagrams have arrived. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self.packets < packets:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def summary(self):
+        with self.lock:
+            seconds = (self.last_at - self.first_at) if self.packets > 1 else 0.0
+            rate = f"{self.record_count / seconds:,.0f} records/s" if seconds else "n/a records/s"
+            per_record = f"{self.bytes / self.record_count:.1f} bytes/record" if self.record_count else "n/a bytes/record"
+            return (f"{self.packets} packets ({self.template_packets} template only), {self.record_count} records, "
+                    f"{self.bytes} bytes; {rate}, {per_record}; {self.malformed} malformed, "
+                    f"{self.gaps} sequence gaps ({self.missing} packets missing)")
+
+def report(collector, seconds):
+    while True:
+        time.sleep(seconds)
+        print(collector.summary())
+
+def main():
+    parser = argparse.ArgumentParser(description="Receive and check IPFIX packets as PSK Reporter would.")
+    parser.add_argument("--host", default=COLLECTOR_HOST, help=f"Address to listen on (default {COLLECTOR_HOST}).")
+    parser.add_argument("--port", type=int, default=COLLECTOR_PORT, help=f"Port to listen on (default {COLLECTOR_PORT}).")
+    parser.add_argument("--verbose", action="store_true", help="Print every decoded record and problem as it arrives.")
+    parser.add_argument("--reportSeconds", type=float, default=10.0, help="Print the counts this often (0 = only at exit).")
+    args = parser.parse_args()
+
+    collector = IPFIXCollector(args.host, args.port, verbose=args.verbose)
+    if args.reportSeconds:
+        threading.Thread(target=report, args=(collector, args.reportSeconds), daemon=True).start()
+
+    print(f"IPFIX collector listening on {args.host}:{args.port}")
+    try:
+        collector.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Stopped: {collector.summary()}")
+        for problem in collector.problems:
+            print(f"  {problem}")
+    finally:
+        collector.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Running statistics of a series of durations: flrig round-trips, switch latency, wakeup lateness.
+"""
+from collections import deque
+
+class LatencyStats:
+    """Round-trip times of flrig calls, overall and for the current poll cycle."""
+
+    def __init__(self, window=100):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.last = None
+        self.min = None
+        self.max = None
+        self.recent = deque(maxlen=window)
+        self.cycle_calls = 0
+        self.cycle_total = 0.0
+
+    def record(self, seconds):
+        self.calls += 1
+        self.total += seconds
+        self.last = seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+        self.recent.append(seconds)
+        self.cycle_calls += 1
+        self.cycle_total += seconds
+
+    def record_error(self):
+        self.errors += 1
+
+    def begin_cycle(self):
+        """Start counting calls for a new poll cycle."""
+        self.cycle_calls = 0
+        self.cycle_total = 0.0
+
+    @property
+    def mean(self):
+        return self.total / self.calls if self.calls else None
+
+    def percentile(self, fraction):
+        """Percentile of the recent round-trips, e.g. percentile(0.95)."""
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self):
+        if not self.calls:
+            return "no calls yet"
+        return (f"{self.cycle_calls} calls / {self.cycle_total * 1000:.1f} ms this poll, "
+                f"last {self.last * 1000:.1f} ms, mean {self.mean * 1000:.1f} ms, "
+                f"p95 {self.percentile(0.95) * 1000:.1f} ms, {self.errors} errors")
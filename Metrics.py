@@ -0,0 +1,179 @@
+"""
+Timings and counters for the antenna scripts, served in the Prometheus text format.
+
+The engine times every phase of a switch (frequency read, state read-back, commands)
+and every flrig call into latency histograms, and counts errors, band changes and
+commands sent. They are served at http://METRICS_HOST:METRICS_PORT/metrics, and each
+switch can also be written as a JSON line to a rotating log file, so a bad night can
+be looked at in the morning instead of hunted for in print output.
+
+Recording a value is a perf_counter() call, a bisect and a dict update under a lock,
+a few microseconds against a poll cycle of milliseconds.
+"""
+import bisect
+import json
+import logging
+import logging.handlers
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_HOST = "127.0.0.1"  # Only this machine can read the metrics; use "0.0.0.0" to share them
+METRICS_PORT = 9475         # Set to None to turn the metrics endpoint off
+METRICS_LOG_PATH = None     # e.g. "antenna_metrics.log" for a rotating JSON-lines log of every switch
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUPS = 5
+
+# Histogram bucket upper bounds in seconds, from a fast local flrig to a struggling one
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+class Histogram:
+    """Counts of observations per bucket, plus their sum, as Prometheus histograms keep them."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+def escape_label_value(value):
+    """A label value as the exposition format wants it, with backslash, quote and newline escaped."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in labels) + "}"
+
+class Metrics:
+    """A registry of counters and histograms, keyed by name and labels. Safe to use from any thread."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.help = {}  # name -> (type, help text)
+        self.counters = {}  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> Histogram
+        self.logger = None
+
+    def describe(self, name, kind, text):
+        self.help.setdefault(name, (kind, text))
+
+    def count(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timed(self, name, **labels):
+        """Observes how long the with block took, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            names = sorted({name for name, _ in self.counters} | {name for name, _ in self.histograms})
+            for name in names:
+                kind, text = self.help.get(name, ("untyped", ""))
+                if text:
+                    lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for (metric, labels), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{format_labels(labels)} {value}")
+                for (metric, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{format_labels(labels + (('le', bound),))} {cumulative}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def enable_log(self, path, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS):
+        """Writes every event() to path as a JSON line, rotating it at max_bytes."""
+        self.logger = logging.getLogger(f"antenna.metrics.{path}")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self.logger.addHandler(handler)
+
+    def event(self, name, **fields):
+        """Logs one structured event, e.g. a switch with its phase timings, if the log is enabled."""
+        if self.logger:
+            fields = dict(time=round(time.time(), 3), event=name, **fields)
+            self.logger.info(json.dumps(fields, sort_keys=True, default=str))
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(metrics, host=METRICS_HOST, port=METRICS_PORT):
+    """Serves metrics on a daemon thread. Returns the server, or None if it couldn't start."""
+    if port is None:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except Exception as e:
+        print(f"Error starting metrics endpoint on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    server.metrics = metrics
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics at http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+_default_metrics = None
+
+def default_metrics():
+    """The registry the scripts share, with the metric descriptions filled in."""
+    global _default_metrics
+    if _default_metrics is None:
+        metrics = Metrics()
+        metrics.describe("flrig_call_seconds", "histogram", "Round-trip time of each flrig XML-RPC request, by method.")
+        metrics.describe("flrig_errors_total", "counter", "flrig requests that failed or timed out, by method.")
+        metrics.describe("antenna_phase_seconds", "histogram", "Time spent in each phase of a poll or switch.")
+        metrics.describe("antenna_polls_total", "counter", "Frequency polls.")
+        metrics.describe("antenna_poll_errors_total", "counter", "Frequency polls that failed.")
+        metrics.describe("antenna_band_changes_total", "counter", "Band changes seen.")
+        metrics.describe("antenna_commands_total", "counter", "Commands sent to the rig, by field.")
+        metrics.describe("antenna_switch_errors_total", "counter", "Switches whose commands failed.")
+        metrics.describe("antenna_wakeup_lateness_seconds", "histogram", "How late each poll woke up after its scheduled tick.")
+        metrics.describe("antenna_prestage_total", "counter", "Switches made ahead of a predicted band hop, by outcome: hit, miss, or undone before the hop.")
+        metrics.describe("antenna_drift_total", "counter", "Read-backs that found the rig changed behind the script's back.")
+        if METRICS_LOG_PATH:
+            metrics.enable_log(METRICS_LOG_PATH)
+        _default_metrics = metrics
+    return _default_metrics
@@ -0,0 +1,254 @@
+"""
+Sends encoded IPFIX packets to PSK Reporter from a background thread.
+
+The server's name is resolved once and kept for RESOLVE_TTL_SECONDS instead of on
+every sendto. Packets are queued and paced by a token bucket, so callers never
+sleep between packets themselves. A send that fails is retried with exponential
+backoff; one that still fails is appended to a spool file, which is sent again by
+the next run, or by a long-running one OFFLINE_SECONDS after the last packet was
+spooled. Spooled packets are resent by the sender thread in the gaps between new
+ones, so a full spool never holds up the caller. Point it at any UDP listener (host:port) to try it without the network.
+"""
+import collections
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+
+RESOLVE_TTL_SECONDS = 300  # How long a resolved address is used before resolving again
+PACKETS_PER_SECOND = 5     # PSK Reporter asks for a small gap between packets
+SEND_BURST = 4             # Packets that may go back to back after a quiet spell
+QUEUE_PACKETS = 256        # Callers wait when this many packets are waiting to be sent
+SEND_RETRIES = 4           # Retries of a failed send before it is spooled
+RETRY_BASE_SECONDS = 0.5   # First retry delay; doubled on each retry
+OFFLINE_SECONDS = 30       # After a packet is spooled, spool the following ones for this long without trying
+SPOOL_MAX_BYTES = 10 * 1024 * 1024
+SPOOL_LENGTH = struct.Struct(">H")  # Each spooled packet is its length followed by its bytes
+RESEND_SPOOL = object()  # Queued by resend_spool() to have the sender thread read the spool
+
+class AddressCache:
+    """getaddrinfo results for (host, port), reused for ttl seconds."""
+
+    def __init__(self, ttl=RESOLVE_TTL_SECONDS):
+        self.ttl = ttl
+        self.entries = {}  # (host, port) -> (family, sockaddr, expires at)
+        self.lookups = 0
+
+    def resolve(self, host, port):
+        """(family, sockaddr) of host:port. Raises socket.gaierror if it can't be resolved."""
+        entry = self.entries.get((host, port))
+        if entry and time.monotonic() < entry[2]:
+            return entry[0], entry[1]
+        self.lookups += 1
+        family, _, _, _, sockaddr = socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM)[0]
+        self.entries[(host, port)] = (family, sockaddr, time.monotonic() + self.ttl)
+        return family, sockaddr
+
+    def forget(self, host, port):
+        """Resolve again on the next call, e.g. after a send to the cached address failed."""
+        self.entries.pop((host, port), None)
+
+class TokenBucket:
+    """Allows rate events per second on average, and up to burst of them at once."""
+
+    def __init__(self, rate=PACKETS_PER_SECOND, burst=SEND_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def delay(self):
+        """Take a token. Returns how many seconds to wait before using it."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+class PSKReporterSender:
+    """
+    A queue of packets for host:port, sent in order by a daemon thread.
+
+    send() only queues a packet; flush() waits until everything queued has been sent
+    or spooled, which is the point at which a checkpoint may be saved. Packets read
+    back from the spool wait in self.resending and go out only when the queue is empty.
+    """
+
+    def __init__(self, host, port, rate=PACKETS_PER_SECOND, burst=SEND_BURST, spool_path=None,
+                 retries=SEND_RETRIES, retry_base=RETRY_BASE_SECONDS, debug=False):
+        self.host = host
+        self.port = port
+        self.addresses = AddressCache()
+        self.bucket = TokenBucket(rate, burst)
+        self.spool_path = spool_path
+        self.retries = retries
+        self.retry_base = retry_base
+        self.debug = debug
+        self.sock = None
+        self.family = None
+        self.offline_until = 0.0
+        self.packets_sent = 0
+        self.bytes_sent = 0
+        self.retried = 0
+        self.spooled = 0
+        self.spool_dropped = 0
+        self.spool_waiting = False  # Whether this run has spooled packets not yet resent
+        self.resending = collections.deque()  # Packets read back from the spool, not yet sent
+        self.resend_on_close = True
+        self.queue = queue.Queue(QUEUE_PACKETS)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def send(self, packet):
+        """Queue packet to be sent, waiting while the queue is full."""
+        self.queue.put(packet)
+
+    def flush(self):
+        """Wait until every queued packet has been sent or spooled. Doesn't wait for the spool being resent."""
+        self.queue.join()
+
+    def close(self, resend=True):
+        """
+        Send what is queued and stop the thread. Packets still being resent from the
+        spool are sent first, or with resend=False written back to the spool for the
+        next run, so an interrupted long run stops straight away.
+        """
+        self.flush()
+        self.resend_on_close = resend
+        self.queue.put(None)
+        self.thread.join()
+        if self.sock:
+            self.sock.close()
+        print(self.summary())
+
+    def spool_due(self):
+        """True when this run has spooled packets and the offline period after the last one is over."""
+        return self.spool_waiting and time.monotonic() >= self.offline_until
+
+    def resend_spool(self):
+        """
+        Have the sender thread resend the spooled packets, after the template has gone out.
+
+        Call it at the start of a run, and in a long run whenever spool_due() says so. It
+        returns at once: the thread reads the spool itself, so it isn't appending to the
+        file as it is read, and sends those packets only while nothing new is queued.
+        """
+        self.spool_waiting = False
+        if self.spool_path:
+            self.queue.put(RESEND_SPOOL)
+
+    def read_spool(self):
+        """Move the spool file's packets onto self.resending. Returns how many."""
+        if not os.path.exists(self.spool_path):
+            return 0
+        try:
+            with open(self.spool_path, "rb") as f:
+                data = f.read()
+            os.remove(self.spool_path)
+        except Exception as e:
+            print(f"Error reading spool {self.spool_path}: {e}")
+            return 0
+        count = 0
+        offset = 0
+        while offset + SPOOL_LENGTH.size <= len(data):
+            length, = SPOOL_LENGTH.unpack_from(data, offset)
+            offset += SPOOL_LENGTH.size
+            packet = data[offset:offset + length]
+            offset += length
+            if len(packet) == length:
+                self.resending.append(packet)
+                count += 1
+        if count:
+            print(f"Resending {count} spooled packets.")
+        return count
+
+    def run(self):
+        while True:
+            if self.resending:
+                # New packets go first; a spooled one is sent only when none is waiting
+                try:
+                    packet = self.queue.get_nowait()
+                except queue.Empty:
+                    self.deliver(self.resending.popleft())
+                    continue
+            else:
+                packet = self.queue.get()
+            try:
+                if packet is None:
+                    while self.resending:
+                        packet = self.resending.popleft()
+                        if self.resend_on_close:
+                            self.deliver(packet)
+                        else:
+                            self.spool(packet)
+                    return
+                if packet is RESEND_SPOOL:
+                    self.read_spool()
+                else:
+                    self.deliver(packet)
+            finally:
+                self.queue.task_done()
+
+    def deliver(self, packet):
+        """Send packet, or spool it while offline or when every retry fails."""
+        if time.monotonic() < self.offline_until:
+            self.spool(packet)
+        elif not self.send_with_retries(packet):
+            self.spool(packet)
+            self.offline_until = time.monotonic() + OFFLINE_SECONDS
+
+    def send_with_retries(self, packet):
+        """Send packet, retrying with backoff. Returns False if every attempt failed."""
+        time.sleep(self.bucket.delay())
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += 1
+                time.sleep(self.retry_base * 2 ** (attempt - 1))
+            try:
+                self.send_now(packet)
+                return True
+            except Exception as e:
+                print(f"Error sending packet (attempt {attempt + 1} of {self.retries + 1}): {e}")
+                self.addresses.forget(self.host, self.port)
+        return False
+
+    def send_now(self, packet):
+        family, address = self.addresses.resolve(self.host, self.port)
+        if self.sock is None or family != self.family:
+            if self.sock:
+                self.sock.close()
+            self.sock = socket.socket(family, socket.SOCK_DGRAM)
+            self.family = family
+        self.sock.sendto(packet, address)
+        self.packets_sent += 1
+        self.bytes_sent += len(packet)
+        if self.debug:
+            print("Packet sent successfully to UDP socket.")
+
+    def spool(self, packet):
+        """Append packet to the spool file, if there is one, for a later run to send."""
+        if not self.spool_path:
+            self.spool_dropped += 1
+            return
+        try:
+            if os.path.exists(self.spool_path) and os.path.getsize(self.spool_path) + len(packet) > SPOOL_MAX_BYTES:
+                self.spool_dropped += 1
+                return
+            with open(self.spool_path, "ab") as f:
+                f.write(SPOOL_LENGTH.pack(len(packet)) + packet)
+            self.spooled += 1
+            self.spool_waiting = True
+        except Exception as e:
+            print(f"Error spooling packet to {self.spool_path}: {e}")
+            self.spool_dropped += 1
+
+    def summary(self):
+        text = (f"Sent {self.packets_sent} packets ({self.bytes_sent} bytes) to {self.host}:{self.port}, "
+                f"{self.retried} retries, {self.addresses.lookups} name lookups")
+        if self.spooled:
+            text += f", {self.spooled} spooled to {self.spool_path}"
+        if self.spool_dropped:
+            text += f", {self.spool_dropped} dropped"
+        return text + "."
@@ -0,0 +1,109 @@
+"""
+Declarative per-band rig state, and the commands needed to reach it.
+
+A policy file (see policies/) says which state each band wants: antenna, preamp,
+power and split. Antenna, preamp and power states are reached by pressing flrig
+User Buttons via rig.cmd; split is set with rig.set_split. The engine keeps a model
+of the last state it put the rig in and only sends the commands for fields that
+differ, so a poll on a band that is already set up sends nothing.
+"""
+import json
+import os
+
+POLICY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "policies")
+
+# Order commands are sent in when several fields change at once
+FIELD_ORDER = ("split", "antenna", "power", "preamp")
+
+class RigPolicy:
+    """The desired state per band, and the User Buttons that select each state."""
+
+    def __init__(self, bands, buttons, description="", readers=None):
+        self.bands = bands
+        self.buttons = buttons
+        self.description = description
+        self.readers = readers or {}  # field -> flrig call that reads it back, see RigState.py
+        for field in self.readers:
+            if field not in FIELD_ORDER:
+                raise ValueError(f"readers: unknown field {field!r}")
+        for band, desired in bands.items():
+            for field, value in desired.items():
+                if field not in FIELD_ORDER:
+                    raise ValueError(f"{band}: unknown field {field!r}")
+                if field != "split" and value not in buttons.get(field, {}):
+                    raise ValueError(f"{band}: no button configured for {field} {value!r}")
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            policy = json.load(f)
+        return cls(policy["bands"], policy.get("buttons", {}), policy.get("description", ""),
+                   policy.get("readers"))
+
+    @classmethod
+    def for_script(cls, name):
+        """The policy shipped for a script, e.g. RigPolicy.for_script("AntennaPortForBandGUI")."""
+        return cls.load(os.path.join(POLICY_DIR, f"{name}.json"))
+
+    def desired(self, band):
+        """The state band wants, or None if the band isn't covered by the policy."""
+        return self.bands.get(band)
+
+    def commands_for(self, field, value):
+        """The flrig calls that put field into value, as (method, args) tuples."""
+        if field == "split":
+            return [("rig.set_split", (int(value),))]
+        buttons = self.buttons[field][value]
+        if isinstance(buttons, int):
+            buttons = [buttons]
+        return [("rig.cmd", (button,)) for button in buttons]
+
+class PolicyEngine:
+    """
+    Tracks the rig state the policy has set and works out the commands to apply.
+
+    Values read back from the rig (see RigState.py) take precedence over the model. When the band changes, fields the new band doesn't manage are
+    forgotten, since something else may change them while the policy doesn't care.
+    """
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.band = None
+        self.state = {}  # field -> last value the engine set
+
+    def known_state(self, band, desired):
+        # Fields the new band doesn't manage are forgotten on a band change
+        if band == self.band:
+            return dict(self.state)
+        return {field: value for field, value in self.state.items() if field in desired}
+
+    def plan(self, band, observed=None):
+        """
+        Work out what band needs from the current state.
+
+        Returns (desired, changes): the state band wants, or None if the policy doesn't
+        cover it, and the (field, value) pairs to change, in the order to apply them.
+        """
+        desired = self.policy.desired(band)
+        if desired is None:
+            return None, []
+        actual = self.known_state(band, desired)
+        actual.update(observed or {})
+        changes = [(field, desired[field]) for field in FIELD_ORDER
+                   if field in desired and actual.get(field) != desired[field]]
+        return desired, changes
+
+    def commands(self, changes):
+        """The flrig calls for the changes from plan(), as (method, args) tuples."""
+        return [call for field, value in changes for call in self.policy.commands_for(field, value)]
+
+    def applied(self, band, desired):
+        """Record that the commands from plan() went through."""
+        self.state = self.known_state(band, desired)
+        self.state.update(desired)
+        self.band = band
+
+    def failed(self):
+        """Forget the model after a failed command, so the next sync sends everything again."""
+        self.band = None
+        self.state = {}
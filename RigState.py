@@ -0,0 +1,107 @@
+"""
+Cached, read-back rig state for the antenna scripts.
+
+The scripts used to trust their own idea of what they last set, so a port changed
+by hand on the radio was never noticed. Here each field is stored with the time it
+was read (or set), and is read back from flrig once it is older than its TTL, all
+expired fields in one multicall. Fresh values are served from the cache, so a poll
+normally costs no extra round-trips. The cache makes no calls itself: the engine
+sends read_calls(due()) in one multicall and hands the replies to store().
+
+Which flrig call reads each field is configured in the policy files, under
+"readers". flrig has getters for some settings (rig.get_split, rig.get_power); for
+the rest a raw CAT query can be sent with rig.cat_string and its reply mapped to a
+state name.
+"""
+import time
+
+RIG_STATE_TTL = 10.0  # Seconds a read-back value is trusted before flrig is asked again
+
+class StateReader:
+    """One flrig call that reads a field, and how its reply maps to a state value."""
+
+    def __init__(self, method, args=(), values=None):
+        self.method = method
+        self.args = tuple(args)
+        self.values = values or {}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config["method"], config.get("args", ()), config.get("values"))
+
+    def call(self):
+        return (self.method, self.args)
+
+    def parse(self, reply):
+        """The state value for a reply. Replies not in the values map are returned as read."""
+        if not self.values:
+            return reply
+        if isinstance(reply, str):
+            reply = reply.strip()
+        return self.values.get(str(reply), reply)
+
+class RigStateCache:
+    """Field values read from (or set on) the rig, each with the time it was stored."""
+
+    def __init__(self, readers, ttl=RIG_STATE_TTL):
+        self.readers = readers  # field -> StateReader
+        self.ttl = ttl
+        self.entries = {}  # field -> (value, stored_at)
+        self.reads = 0
+        self.hits = 0
+        self.drift = 0  # Read-backs that disagreed with the cached value
+
+    @classmethod
+    def for_policy(cls, policy, ttl=RIG_STATE_TTL):
+        readers = {field: StateReader.from_config(config) for field, config in policy.readers.items()}
+        return cls(readers, ttl)
+
+    def fresh(self, field, now):
+        entry = self.entries.get(field)
+        return entry is not None and now - entry[1] < self.ttl
+
+    def put(self, field, value, now=None):
+        """Record a value, e.g. one just set by a command."""
+        if now is None:
+            now = time.monotonic()
+        self.entries[field] = (value, now)
+
+    def invalidate(self, field=None):
+        """Forget one field, or all of them, so the next lookup reads it back."""
+        if field is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(field, None)
+
+    def due(self, fields, now):
+        """The readable fields that have expired and need reading back."""
+        due = [field for field in fields if field in self.readers and not self.fresh(field, now)]
+        self.hits += sum(1 for field in fields if field in self.readers) - len(due)
+        return due
+
+    def read_calls(self, fields):
+        """The flrig calls that read fields, as (method, args) tuples."""
+        return [self.readers[field].call() for field in fields]
+
+    def store(self, fields, replies, now):
+        """Record the replies to read_calls(fields)."""
+        self.reads += len(fields)
+        for field, reply in zip(fields, replies):
+            value = self.readers[field].parse(reply)
+            if field in self.entries and self.entries[field][0] != value:
+                self.drift += 1
+                print(f"Rig {field} is {value}, not {self.entries[field][0]} as last known")
+            self.entries[field] = (value, now)
+
+    def read_failed(self, fields, error):
+        print(f"Error reading back rig state: {error}")
+        for field in fields:
+            self.invalidate(field)
+
+    def current(self, fields):
+        """The cached values of the readable fields in fields."""
+        return {field: self.entries[field][0] for field in fields
+                if field in self.readers and field in self.entries}
+
+    def summary(self):
+        return f"{self.reads} read-backs, {self.hits} cache hits, {self.drift} drifted"
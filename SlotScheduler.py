@@ -0,0 +1,85 @@
+"""
+Poll timing locked to the UTC slots WSJT-X transmits and hops in.
+
+Ticks fall every period seconds at fixed points in each slot: period is rounded so a
+whole number of ticks fits a slot, and the first tick of each slot comes offset
+seconds after the slot boundary. The phase is taken from the wall clock, but every
+sleep is a monotonic-clock sleep to the next tick, worked out again each cycle. That way a slow poll doesn't push later ticks back, and an NTP step
+moves at most one tick instead of stalling or bunching the polls. How late each
+wakeup was is kept as jitter statistics.
+"""
+import asyncio
+import math
+import time
+
+from BandWatcher import POLL_INTERVAL
+from LatencyStats import LatencyStats
+
+SLOT_LENGTHS = {"FT8": 15.0, "FT4": 7.5, "minute": 60.0}
+SLOT_SECONDS = SLOT_LENGTHS["FT8"]
+# WSJT-X changes band at the slot boundary and signals start about 0.5 s later, so
+# a tick shortly after the boundary switches the antenna in the quiet gap between.
+SLOT_OFFSET_SECONDS = 0.1
+CLOCK_STEP_SECONDS = 0.05  # A change in wall minus monotonic time bigger than this is a clock step
+
+class SlotScheduler:
+    """Says how long to sleep until the next tick; wait() does the sleeping."""
+
+    def __init__(self, period=POLL_INTERVAL, slot_seconds=SLOT_SECONDS, offset=SLOT_OFFSET_SECONDS,
+                 wall=time.time, clock=time.monotonic):
+        if slot_seconds:
+            period = slot_seconds / max(1, round(slot_seconds / period))
+        self.period = period
+        self.slot_seconds = slot_seconds
+        self.offset = offset
+        self.wall = wall
+        self.clock = clock
+        self.tick = None  # Index of the tick last scheduled, counted from the epoch
+        self.deadline = None  # Monotonic time of that tick
+        self.wall_offset = None
+        self.lateness = LatencyStats()
+        self.skipped = 0
+        self.clock_steps = 0
+
+    def delay(self):
+        """
+        Schedule the next tick and return the seconds until it. That is at most one
+        period, except after waking early for a tick, when the tick after it is
+        scheduled and the wait is one period plus however early the wakeup was.
+        """
+        now = self.clock()
+        wall_now = self.wall()
+        wall_offset = wall_now - now
+        stepped = self.wall_offset is not None and abs(wall_offset - self.wall_offset) > CLOCK_STEP_SECONDS
+        if stepped:
+            self.clock_steps += 1
+        self.wall_offset = wall_offset
+
+        tick = math.floor((wall_now - self.offset) / self.period) + 1
+        if self.tick is not None and not stepped:
+            if tick <= self.tick:
+                tick = self.tick + 1  # Woke a little early: don't run the same tick twice
+            self.skipped += max(0, tick - self.tick - 1)  # The last cycle overran these
+        self.tick = tick
+        self.deadline = now + (tick * self.period + self.offset - wall_now)
+        return max(0.0, self.deadline - now)
+
+    def woke(self):
+        """Record how late the wakeup for the scheduled tick was. Returns the lateness in seconds."""
+        lateness = max(0.0, self.clock() - self.deadline)
+        self.lateness.record(lateness)
+        return lateness
+
+    async def wait(self):
+        """Sleep in the event loop until the next tick. Returns how late the wakeup was."""
+        await asyncio.sleep(self.delay())
+        return self.woke()
+
+    def summary(self):
+        stats = self.lateness
+        if not stats.calls:
+            return f"every {self.period:g} s, no wakeups yet"
+        slots = f" in {self.slot_seconds:g} s slots" if self.slot_seconds else ""
+        return (f"every {self.period:g} s{slots}, late by mean {stats.mean * 1000:.1f} ms, "
+                f"p95 {stats.percentile(0.95) * 1000:.1f} ms, worst {stats.max * 1000:.1f} ms; "
+                f"{self.skipped} ticks skipped, {self.clock_steps} clock steps")
@@ -0,0 +1,21 @@
+"""
+The spot record passed from the ALL.TXT parser and the WSJT-X listener to the uploader,
+and the fuller decode record SpotStore keeps.
+
+A namedtuple rather than a dict: it has no per-instance __dict__, so a spot is a
+small fixed-size tuple, which matters when a backfill streams millions of them.
+"""
+from collections import namedtuple
+
+# timestamp: Unix time in seconds (UTC); frequency: Hz. For ALL.TXT decodes,
+# sender_callsign and sender_locator are the first two words of the message, as the
+# uploader has always sent them; heard_callsign is the station that actually sent the
+# message ("CQ K1ABC FN42" and "N0MQL K1ABC -05" are both K1ABC's), or None if unknown.
+Spot = namedtuple("Spot", ["timestamp", "frequency", "mode", "sender_callsign", "sender_locator", "heard_callsign"],
+                  defaults=(None,))
+
+# A decode line from ALL.TXT with everything on it. timestamp: whole Unix seconds;
+# snr: dB; dt: seconds; audio_offset: Hz; to_callsign: the station called, "" for a CQ;
+# message: the decoded message text
+Decode = namedtuple("Decode", ["timestamp", "frequency", "mode", "snr", "dt", "audio_offset",
+                               "sender_callsign", "sender_locator", "to_callsign", "message"])
@@ -0,0 +1,231 @@
+"""
+Every decode in ALL.TXT, in a SQLite database that answers questions in milliseconds.
+
+Ingesting reads ALL.TXT from where the last ingest stopped, with the position kept in
+the database itself (same rotation and truncation checks as --checkpoint), and bulk
+inserts the decodes INSERT_BATCH at a time, each batch committed together with the
+position it reached. Each decode keeps what the uploader throws away: SNR, DT, audio
+offset, the station called and the message text. The callsign and grid are the
+sender's, read from the message as the UDP listener reads them, and decodes with no
+sender (free text, say) aren't stored. Decodes are indexed by time, band and time, callsign and
+time, and grid, so asking about one station, band or week reads only those rows.
+
+    python3 SpotStore.py --ingest                       # load new decodes from ALL.TXT
+    python3 SpotStore.py --call K1ABC --limit 1         # when did I last hear K1ABC
+    python3 SpotStore.py --band 60m --since 7d --distinct field
+
+There's no DXCC table here, so --distinct field (the two-letter Maidenhead field of
+the grid) is the nearest stand-in for counting countries.
+"""
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+from WSJTXToPSKReporter import ALL_TXT_PATH, AllTxtTail, band_for_frequency, iter_decodes
+
+SPOT_DB_PATH = os.path.expanduser("~/.local/share/WSJT-X/spots.sqlite")
+INSERT_BATCH = 5000  # Decodes per insert and commit
+QUERY_LIMIT = 20
+SCHEMA_VERSION = 4  # Kept in PRAGMA user_version; 1 filed decodes under the message's first word, 2 left out negative DTs
+EVERYTHING = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS decodes (
+    timestamp INTEGER NOT NULL,   -- Unix seconds, UTC
+    frequency INTEGER NOT NULL,   -- Hz
+    band TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    snr INTEGER NOT NULL,
+    dt REAL NOT NULL,
+    audio_offset INTEGER NOT NULL,
+    callsign TEXT NOT NULL,       -- The sender
+    locator TEXT NOT NULL,
+    to_callsign TEXT NOT NULL,    -- The station called, '' for a CQ
+    message TEXT NOT NULL
+);
+-- The same decode read twice (say after a truncated ALL.TXT is read again) is stored once
+CREATE UNIQUE INDEX IF NOT EXISTS decodes_unique ON decodes (timestamp, callsign, frequency, audio_offset);
+CREATE INDEX IF NOT EXISTS decodes_time ON decodes (timestamp);
+CREATE INDEX IF NOT EXISTS decodes_band ON decodes (band, timestamp);
+CREATE INDEX IF NOT EXISTS decodes_callsign ON decodes (callsign, timestamp);
+CREATE INDEX IF NOT EXISTS decodes_locator ON decodes (locator);
+CREATE TABLE IF NOT EXISTS ingest (
+    path TEXT PRIMARY KEY,
+    device INTEGER,
+    inode INTEGER,
+    offset INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    head TEXT                     -- AllTxtTail.head, the start of the file as hex
+);
+"""
+
+# --distinct choices -> the column, or expression, counted
+DISTINCT_COLUMNS = {
+    "call": "callsign",
+    "grid": "locator",
+    "field": "substr(locator, 1, 2)",
+    "band": "band",
+    "mode": "mode",
+}
+
+AGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+def parse_age(text):
+    """Seconds in an age like "90m", "12h", "7d" or "2w"."""
+    unit = text[-1:].lower()
+    if unit not in AGE_UNITS:
+        raise ValueError(f"{text!r} isn't an age like 90m, 12h, 7d or 2w")
+    return float(text[:-1]) * AGE_UNITS[unit]
+
+class SpotStore:
+    """The decodes database at path, created if it doesn't exist."""
+
+    def __init__(self, path=SPOT_DB_PATH):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version == 3:
+            # Version 3 only lacks the head column; its rows are fine
+            self.db.execute("ALTER TABLE ingest ADD COLUMN head TEXT")
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        elif version != SCHEMA_VERSION:
+            # An older store's rows are wrong or incomplete, so drop them and ingest again from the start
+            self.db.executescript("DROP TABLE IF EXISTS decodes; DROP TABLE IF EXISTS ingest;")
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def ingest(self, file_path=ALL_TXT_PATH):
+        """Load the decodes added to file_path since the last ingest. Returns how many were new."""
+        if not os.path.exists(file_path):
+            print(f"Error: {file_path} not found.")
+            return 0
+        tail = AllTxtTail(file_path)
+        row = self.db.execute("SELECT device, inode, offset, size, head FROM ingest WHERE path = ?", (file_path,)).fetchone()
+        if row:
+            tail.device, tail.inode, tail.offset, tail.size, tail.head = row
+        print(f"Ingesting {file_path} from byte {tail.offset}...")
+
+        added = 0
+        batch = []
+        for decode in iter_decodes(tail.read_lines(), EVERYTHING):
+            batch.append((decode.timestamp, round(decode.frequency), band_for_frequency(decode.frequency),
+                          decode.mode, decode.snr, decode.dt, decode.audio_offset,
+                          decode.sender_callsign, decode.sender_locator, decode.to_callsign, decode.message))
+            if len(batch) >= INSERT_BATCH:
+                # tail.offset is just past the line of the last decode taken, so it matches the batch
+                added += self.insert(batch, file_path, tail)
+                batch = []
+        added += self.insert(batch, file_path, tail)
+        return added
+
+    def insert(self, batch, file_path, tail):
+        """Insert batch and record how far into file_path it goes, in one transaction. Returns the rows added."""
+        with self.db:
+            added = self.db.executemany("INSERT OR IGNORE INTO decodes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch).rowcount
+            self.db.execute("INSERT OR REPLACE INTO ingest VALUES (?, ?, ?, ?, ?, ?)",
+                            (file_path, tail.device, tail.inode, tail.offset, tail.size, tail.head))
+        return max(added, 0)
+
+    def where(self, call=None, band=None, mode=None, grid=None, since=None):
+        """A WHERE clause and its parameters for the given filters; since is a Unix time."""
+        clauses = []
+        params = []
+        if call:
+            clauses.append("callsign = ?")
+            params.append(call.upper())
+        if band:
+            clauses.append("band = ?")
+            params.append(band)
+        if mode:
+            clauses.append("mode = ?")
+            params.append(mode.upper())
+        if grid:
+            # A range rather than LIKE, so the locator index is used
+            grid = grid.upper()
+            clauses.append("locator >= ? AND locator < ?")
+            params += [grid, grid[:-1] + chr(ord(grid[-1]) + 1)]
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(int(since))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def decodes(self, limit=QUERY_LIMIT, **filters):
+        """The latest matching decodes, newest first, as rows in column order."""
+        where, params = self.where(**filters)
+        return self.db.execute(f"SELECT * FROM decodes{where} ORDER BY timestamp DESC LIMIT ?", params + [limit]).fetchall()
+
+    def last_heard(self, call):
+        """The latest decode of call, or None."""
+        rows = self.decodes(limit=1, call=call)
+        return rows[0] if rows else None
+
+    def count(self, **filters):
+        where, params = self.where(**filters)
+        return self.db.execute(f"SELECT COUNT(*) FROM decodes{where}", params).fetchone()[0]
+
+    def distinct(self, column, **filters):
+        """(value, decodes) for each distinct value of a DISTINCT_COLUMNS choice, most decodes first."""
+        expression = DISTINCT_COLUMNS[column]
+        where, params = self.where(**filters)
+        where += (" AND " if where else " WHERE ") + f"{expression} != ''"
+        return self.db.execute(f"SELECT {expression}, COUNT(*) FROM decodes{where} "
+                               f"GROUP BY 1 ORDER BY 2 DESC, 1", params).fetchall()
+
+def format_decode(row):
+    timestamp, frequency, band, mode, snr, dt, audio_offset, call, locator, to_call, message = row
+    when = datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    return (f"{when}  {frequency / 1e6:9.6f} MHz  {band:>5}  {mode:4}  {snr:+3d} dB  {dt:+5.1f} s  "
+            f"{audio_offset:4d} Hz  {call:10} {locator:6} {message}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load WSJT-X decodes into SQLite and query them.")
+    parser.add_argument("--db", default=SPOT_DB_PATH, help=f"Database file (default {SPOT_DB_PATH}).")
+    parser.add_argument("--ingest", nargs="?", const=ALL_TXT_PATH, default=None,
+                        help=f"Load the decodes added to this ALL.TXT since the last ingest first (default {ALL_TXT_PATH}).")
+    parser.add_argument("--call", help="Only decodes of this callsign.")
+    parser.add_argument("--band", help="Only decodes on this band, e.g. 60m.")
+    parser.add_argument("--mode", help="Only decodes in this mode, e.g. FT8.")
+    parser.add_argument("--grid", help="Only decodes from grids starting with this, e.g. FN or FN42.")
+    parser.add_argument("--since", help="Only decodes newer than this age, e.g. 90m, 12h, 7d or 2w.")
+    parser.add_argument("--distinct", choices=sorted(DISTINCT_COLUMNS), help="Count the distinct calls, grids, grid fields, bands or modes.")
+    parser.add_argument("--count", action="store_true", help="Just count the matching decodes.")
+    parser.add_argument("--limit", type=int, default=QUERY_LIMIT, help=f"Decodes to list, newest first (default {QUERY_LIMIT}).")
+    args = parser.parse_args()
+
+    store = SpotStore(args.db)
+    try:
+        if args.ingest:
+            start = time.perf_counter()
+            added = store.ingest(args.ingest)
+            print(f"Added {added} decodes in {time.perf_counter() - start:.1f} s.")
+            if not any((args.call, args.band, args.mode, args.grid, args.since, args.distinct, args.count)):
+                return
+
+        filters = dict(call=args.call, band=args.band, mode=args.mode, grid=args.grid,
+                       since=time.time() - parse_age(args.since) if args.since else None)
+        start = time.perf_counter()
+        if args.distinct:
+            rows = store.distinct(args.distinct, **filters)
+            for value, count in rows[:args.limit]:
+                print(f"{value:10} {count}")
+            summary = f"{len(rows)} distinct"
+        elif args.count:
+            summary = f"{store.count(**filters)} decodes"
+        else:
+            rows = store.decodes(args.limit, **filters)
+            for row in rows:
+                print(format_decode(row))
+            summary = f"{len(rows)} decodes"
+        print(f"{summary} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
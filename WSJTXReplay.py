@@ -0,0 +1,86 @@
+"""
+Replays decodes from an ALL.TXT file as WSJT-X UDP messages, so the --listen mode of
+WSJTXToPSKReporter.py can be exercised locally without a radio.
+
+    python3 ./WSJTXReplay.py --path ALL.TXT --port 2237 --speed 0
+"""
+import argparse
+import os
+import socket
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import WSJTXUdp
+
+ALL_TXT_PATH = os.path.expanduser("~/.local/share/WSJT-X/ALL.TXT")
+CLIENT_ID = "WSJT-X Replay"
+
+def parse_replay_line(line):
+    """
+    Split an ALL.TXT Rx line into the fields of a Decode message.
+
+    Returns (datetime, dial_hz, mode, snr, dt, audio_hz, message) or None for Tx and other lines.
+    """
+    tokens = line.split()
+    if len(tokens) < 8:
+        return None
+    stamp, freq = tokens[0], tokens[1]
+    rest = tokens[2:]
+    if rest[0] == "MHz":
+        rest = rest[1:]
+    if rest[0] == "Rx":
+        rest = rest[1:]
+    elif rest[0] == "Tx":
+        return None
+    if len(rest) < 5:
+        return None
+    try:
+        when = datetime.strptime(stamp, "%y%m%d_%H%M%S").replace(tzinfo=timezone.utc)
+        return (when, int(round(float(freq) * 1e6)), rest[0], int(rest[1]), float(rest[2]),
+                int(rest[3]), " ".join(rest[4:]))
+    except ValueError:
+        return None
+
+def replay(sock, address, lines, speed):
+    """Send a Status before each change of dial frequency or mode, then a Decode per line."""
+    status = None
+    previous = None
+    sent = 0
+    for line in lines:
+        decode = parse_replay_line(line)
+        if not decode:
+            continue
+        when, dial_hz, mode, snr, dt, audio_hz, message = decode
+
+        if speed > 0 and previous is not None and when > previous:
+            time.sleep((when - previous).total_seconds() / speed)
+        previous = when
+
+        if status != (dial_hz, mode):
+            status = (dial_hz, mode)
+            sock.sendto(WSJTXUdp.encode_status(CLIENT_ID, dial_hz, mode), address)
+
+        time_ms = ((when.hour * 60 + when.minute) * 60 + when.second) * 1000
+        sock.sendto(WSJTXUdp.encode_decode(CLIENT_ID, time_ms, snr, dt, audio_hz, mode, message), address)
+        sent += 1
+    return sent
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay ALL.TXT decodes as WSJT-X UDP messages.")
+    parser.add_argument("--path", default=ALL_TXT_PATH, help=f"ALL.TXT to replay (default {ALL_TXT_PATH}).")
+    parser.add_argument("--host", default=WSJTXUdp.WSJTX_HOST, help=f"Listener host (default {WSJTXUdp.WSJTX_HOST}).")
+    parser.add_argument("--port", type=int, default=WSJTXUdp.WSJTX_PORT, help=f"Listener port (default {WSJTXUdp.WSJTX_PORT}).")
+    parser.add_argument("--lines", type=int, default=1000, help="Replay only the last N lines (0 = all, default 1000).")
+    parser.add_argument("--speed", type=float, default=0, help="1 = real time, 10 = ten times faster, 0 = as fast as possible.")
+    args = parser.parse_args()
+
+    with open(args.path, "r", errors="replace") as f:
+        lines = deque(f, maxlen=args.lines) if args.lines > 0 else list(f)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sent = replay(sock, (args.host, args.port), lines, args.speed)
+    print(f"Replayed {sent} decodes to {args.host}:{args.port}.")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,17 @@
-import socket
 import struct
 import time
 import os
 import re
 import argparse
-from datetime import datetime, timedelta, timezone
+import json
+import itertools
+from collections import OrderedDict, deque
+from datetime import date, datetime, timedelta, timezone
+
+from BandPlan import default_band_plan
+from PSKReporterSender import PSKReporterSender
+from Spot import Decode, Spot
+import WSJTXUdp
 
 # --- CONFIGURATION ---
 # Change these to match your station
@@ -17,14 +24,33 @@ SOFTWARE_VERSION = "v2.7.1-devel"
 
 # Path to WSJT-X ALL.TXT on your Linux machine
 ALL_TXT_PATH = os.path.expanduser("~/.local/share/WSJT-X/ALL.TXT")
+# Where --checkpoint/--follow remember how far into ALL.TXT they have read
+CHECKPOINT_PATH = os.path.expanduser("~/.local/share/WSJT-X/ALL.TXT.pskreporter-checkpoint")
+FOLLOW_POLL_SECONDS = 5  # How often --follow looks for new lines
+FINGERPRINT_BYTES = 64  # The checkpoint keeps this much of the start of ALL.TXT to spot a replaced file
+TEMPLATE_REFRESH_SECONDS = 3600  # --follow/--listen resend the template this often
+DEDUP_MINUTES = 5  # Don't report the same sender, band and mode again within this time
+DEDUP_MAX_ENTRIES = 50000  # Least recently reported senders are forgotten beyond this
+DEDUP_CACHE_PATH = os.path.expanduser("~/.local/share/WSJT-X/pskreporter-dedup.json")
+LISTEN_FLUSH_SECONDS = 5  # --listen sends what it has collected at most this long after the first spot
 
 # PSK Reporter UDP settings
 PSK_REPORTER_HOST = "report.pskreporter.info"
 PSK_REPORTER_PORT = 4739  # Test port is 14739. Standard is 4739.
 DEBUG_MODE = True        # Set to False for less verbose output
+MAX_PACKET_BYTES = 1400  # Datagram size budget for --batch (stay under the path MTU)
+# Packets that couldn't be sent are kept here and sent again later
+SPOOL_PATH = os.path.expanduser("~/.local/share/WSJT-X/pskreporter-spool.bin")
 
 # --- IPFIX CONSTANTS ---
 ENTERPRISE_ID = 30351
+IPFIX_HEADER_LENGTH = 16
+SET_HEADER_LENGTH = 4
+DATA_OFFSET = IPFIX_HEADER_LENGTH + SET_HEADER_LENGTH  # Where the first data record starts
+IPFIX_MAX_LENGTH = 65535  # The header's length field is 16 bits
+UDP_MAX_PAYLOAD = 65507  # The largest datagram IPv4 can carry, a little under IPFIX_MAX_LENGTH
+TEMPLATE_SET_ID = 2
+TEMPLATE_ID = 256
 
 # Field IDs
 FIELD_SENDER_CALLSIGN = 1
@@ -46,208 +72,855 @@ def pack_string(s):
     else:
         return b"\xff" + struct.pack(">H", len(b)) + b
 
+class IPFIXEncoder:
+    """
+    Builds template and data packets from bytes encoded once up front.
+
+    The template set and the receiver and software fields are the same in every
+    packet, so they are encoded when the encoder is created. Each record then only
+    encodes the per-spot fields, and packets are assembled in one preallocated
+    buffer instead of by concatenating bytes. The buffer is reused between calls,
+    so an encoder must not be shared between threads.
+    """
+
+    HEADER = struct.Struct(">HHIII")
+    SET_HEADER = struct.Struct(">HH")
+    UINT32 = struct.Struct(">I")
+    MAX_STRINGS = 4096  # Bound on the packed-string memo
+
+    def __init__(self, receiver_callsign=RECEIVER_CALLSIGN, receiver_locator=RECEIVER_LOCATOR,
+                 receiver_antenna=RECEIVER_ANTENNA, receiver_rig=RECEIVER_RIG,
+                 software_name=SOFTWARE_NAME, software_version=SOFTWARE_VERSION):
+        self.template_set = self.encode_template_set()
+        self.receiver_fields = b"".join(pack_string(s) for s in (receiver_callsign, receiver_locator, receiver_antenna, receiver_rig))
+        self.software_fields = pack_string(software_name) + pack_string(software_version)
+        self.buffer = bytearray(IPFIX_MAX_LENGTH)
+        self.strings = {}
+
+    def encode_template_set(self):
+        # This is a simplified IPFIX template packet
+        # PSK Reporter expects templates to define the structure of data records
+        
+        # Template Set: SetID (2 for Template Set), Length
+        # Template Record: TemplateID (256+), FieldCount
+        
+        # Fields: FieldID, FieldLength (65535 for variable length)
+        # If FieldID > 32767, it's Enterprise-specific: FieldID | 0x8000, FieldLength, EnterpriseID
+        
+        # For simplicity and based on pskdev documentation, we need to report:
+        # receiverCallsign, receiverLocator, receiverAntenna, receiverRig, senderCallsign, senderLocator, frequency, mode, flowStartSeconds
+        
+        fields = [
+            (FIELD_RECEIVER_CALLSIGN | 0x8000, 65535, ENTERPRISE_ID),
+            (FIELD_RECEIVER_LOCATOR | 0x8000, 65535, ENTERPRISE_ID),
+            (FIELD_RECEIVER_ANTENNA | 0x8000, 65535, ENTERPRISE_ID),
+            (FIELD_RECEIVER_RIG | 0x8000, 65535, ENTERPRISE_ID),
+            (FIELD_SENDER_CALLSIGN | 0x8000, 65535, ENTERPRISE_ID),
+            (FIELD_SENDER_LOCATOR | 0x8000, 65535, ENTERPRISE_ID),
+            (FIELD_FREQUENCY | 0x8000, 4, ENTERPRISE_ID),
+            (FIELD_MODE | 0x8000, 65535, ENTERPRISE_ID),
+            (FIELD_REPORTING_SOFTWARE | 0x8000, 65535, ENTERPRISE_ID),
+            (FIELD_REPORTING_SOFTWARE_VERSION | 0x8000, 65535, ENTERPRISE_ID),
+            (FIELD_FLOW_START_SECONDS, 4, None)
+        ]
+        
+        template_data = struct.pack(">HH", TEMPLATE_ID, len(fields))
+        for f_id, f_len, ent_id in fields:
+            if ent_id:
+                template_data += struct.pack(">HH I", f_id, f_len, ent_id)
+            else:
+                template_data += struct.pack(">HH", f_id, f_len)
+                
+        set_header = self.SET_HEADER.pack(TEMPLATE_SET_ID, SET_HEADER_LENGTH + len(template_data))
+        return set_header + template_data
+
+    def header(self, total_length, sequence_number):
+        # Header: Version (10), Length, ExportTime, SequenceNumber, ObservationDomainID (0)
+        return self.HEADER.pack(10, total_length, int(time.time()), sequence_number, 0)
+
+    def template_packet(self, sequence_number):
+        return self.header(IPFIX_HEADER_LENGTH + len(self.template_set), sequence_number) + self.template_set
+
+    def packed(self, s):
+        """pack_string(s), memoized: modes, callsigns and grids repeat all through a log."""
+        b = self.strings.get(s)
+        if b is None:
+            if len(self.strings) >= self.MAX_STRINGS:
+                self.strings.clear()
+            b = self.strings[s] = pack_string(s)
+        return b
+
+    def write_record(self, offset, spot):
+        """Encode spot into the buffer at offset. Returns the offset just past it."""
+        strings = self.strings
+        timestamp, frequency, mode, call, locator, heard = spot
+        record = b"".join((
+            self.receiver_fields,
+            strings.get(call) or self.packed(call),
+            strings.get(locator) or self.packed(locator),
+            self.UINT32.pack(int(frequency)),
+            strings.get(mode) or self.packed(mode),
+            self.software_fields,
+            self.UINT32.pack(int(timestamp))
+        ))
+        end = offset + len(record)
+        self.buffer[offset:end] = record
+        return end
+
+    def record(self, spot):
+        """One data record on its own, matching the template field order."""
+        end = self.write_record(0, spot)
+        return bytes(self.buffer[:end])
+
+    def finish_packet(self, end, sequence_number):
+        # The header and set header go in front of records written from DATA_OFFSET
+        self.HEADER.pack_into(self.buffer, 0, 10, end, int(time.time()), sequence_number, 0)
+        self.SET_HEADER.pack_into(self.buffer, IPFIX_HEADER_LENGTH, TEMPLATE_ID, end - IPFIX_HEADER_LENGTH)
+        return bytes(self.buffer[:end])
+
+    def data_packet(self, sequence_number, spots):
+        offset = DATA_OFFSET
+        for spot in spots:
+            offset = self.write_record(offset, spot)
+        return self.finish_packet(offset, sequence_number)
+
+    def data_packets(self, sequence_number, spots, max_packet_bytes=MAX_PACKET_BYTES):
+        """
+        Pack spots into as few data packets as fit in max_packet_bytes each.
+
+        Yields (packet, spot_count) with consecutive sequence numbers. A single record
+        that is larger than the budget on its own is still sent, alone.
+        """
+        buf = self.buffer
+        offset = DATA_OFFSET
+        count = 0
+        for spot in spots:
+            start = offset
+            offset = self.write_record(offset, spot)
+            if count and offset > max_packet_bytes:
+                # This record spills over: send the others and move it to the next packet
+                yield self.finish_packet(start, sequence_number), count
+                sequence_number = (sequence_number + 1) & 0xFFFFFFFF
+                length = offset - start
+                buf[DATA_OFFSET:DATA_OFFSET + length] = buf[start:offset]
+                offset = DATA_OFFSET + length
+                count = 0
+            count += 1
+        if count:
+            yield self.finish_packet(offset, sequence_number), count
+
+_encoder = None
+
+def get_encoder():
+    """The shared encoder for the configured station, built on first use."""
+    global _encoder
+    if _encoder is None:
+        _encoder = IPFIXEncoder()
+    return _encoder
+
 def create_template_packet(sequence_number):
-    # This is a simplified IPFIX template packet
-    # PSK Reporter expects templates to define the structure of data records
-    
-    # Header: Version (10), Length, ExportTime, SequenceNumber, ObservationDomainID (0)
-    # We'll fill Length later
-    
-    # Template Set: SetID (2 for Template Set), Length
-    # Template Record: TemplateID (256+), FieldCount
-    
-    # Fields: FieldID, FieldLength (65535 for variable length)
-    # If FieldID > 32767, it's Enterprise-specific: FieldID | 0x8000, FieldLength, EnterpriseID
-    
-    # For simplicity and based on pskdev documentation, we need to report:
-    # receiverCallsign, receiverLocator, receiverAntenna, receiverRig, senderCallsign, senderLocator, frequency, mode, flowStartSeconds
-    
-    fields = [
-        (FIELD_RECEIVER_CALLSIGN | 0x8000, 65535, ENTERPRISE_ID),
-        (FIELD_RECEIVER_LOCATOR | 0x8000, 65535, ENTERPRISE_ID),
-        (FIELD_RECEIVER_ANTENNA | 0x8000, 65535, ENTERPRISE_ID),
-        (FIELD_RECEIVER_RIG | 0x8000, 65535, ENTERPRISE_ID),
-        (FIELD_SENDER_CALLSIGN | 0x8000, 65535, ENTERPRISE_ID),
-        (FIELD_SENDER_LOCATOR | 0x8000, 65535, ENTERPRISE_ID),
-        (FIELD_FREQUENCY | 0x8000, 4, ENTERPRISE_ID),
-        (FIELD_MODE | 0x8000, 65535, ENTERPRISE_ID),
-        (FIELD_REPORTING_SOFTWARE | 0x8000, 65535, ENTERPRISE_ID),
-        (FIELD_REPORTING_SOFTWARE_VERSION | 0x8000, 65535, ENTERPRISE_ID),
-        (FIELD_FLOW_START_SECONDS, 4, None)
-    ]
-    
-    template_id = 256
-    set_id = 2
-    
-    template_data = struct.pack(">HH", template_id, len(fields))
-    for f_id, f_len, ent_id in fields:
-        if ent_id:
-            template_data += struct.pack(">HH I", f_id, f_len, ent_id)
-        else:
-            template_data += struct.pack(">HH", f_id, f_len)
-            
-    set_length = 4 + len(template_data)
-    set_header = struct.pack(">HH", set_id, set_length)
-    
-    export_time = int(time.time())
-    header_length = 16
-    total_length = header_length + set_length
-    
-    header = struct.pack(">HHII I", 10, total_length, export_time, sequence_number, 0)
-    
-    return header + set_header + template_data
+    return get_encoder().template_packet(sequence_number)
+
+def encode_data_record(spot):
+    """Encode one spot as a data record matching the template field order."""
+    return get_encoder().record(spot)
 
 def create_data_packet(sequence_number, spots):
-    # Header
-    # Data Set: SetID (template_id = 256), Length
-    
-    template_id = 256
-    data_records = b""
-    
-    for spot in spots:
-        record = b""
-        record += pack_string(RECEIVER_CALLSIGN)
-        record += pack_string(RECEIVER_LOCATOR)
-        record += pack_string(RECEIVER_ANTENNA)
-        record += pack_string(RECEIVER_RIG)
-        record += pack_string(spot['sender_callsign'])
-        record += pack_string(spot['sender_locator'])
-        record += struct.pack(">I", int(spot['frequency']))
-        record += pack_string(spot['mode'])
-        record += pack_string(SOFTWARE_NAME)
-        record += pack_string(SOFTWARE_VERSION)
-        record += struct.pack(">I", int(spot['timestamp']))
-        data_records += record
-        
-    set_length = 4 + len(data_records)
-    set_header = struct.pack(">HH", template_id, set_length)
-    
-    export_time = int(time.time())
-    header_length = 16
-    total_length = header_length + set_length
-    
-    header = struct.pack(">HHII I", 10, total_length, export_time, sequence_number, 0)
-    
-    return header + set_header + data_records
+    return get_encoder().data_packet(sequence_number, spots)
 
-def parse_all_txt(file_path, minutes_ago=60):
+# Example lines:
+# 251222_052015  14.074 Rx FT8    -12  0.3 1245 K1ABC FN42
+# 251222_052015  14.074 MHz  FT8  -12  0.8  1245 K1ABC FN42
+
+# Columns, split on whitespace:
+# 1: Timestamp (YYMMDD_HHMMSS)
+# 2: Frequency (MHz)
+# 3: Mode (FT8, FT4, etc), optionally after "MHz" and/or "Rx"
+# 4: SNR
+# 5: DT
+# 6: Audio Freq
+# 7: Callsign
+# 8: Grid (optional)
+CALL_PREFIX = re.compile(r"[A-Z0-9/]+")
+LOCATOR_PREFIX = re.compile(r"[A-Z0-9]+")
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+MINUTE_CACHE_SIZE = 100000
+
+# "YYMMDD_HHMM" -> Unix time of that minute, or None if it isn't a valid date
+minute_epochs = {}
+
+def minute_epoch(minute):
+    year, month, day = int(minute[0:2]), int(minute[2:4]), int(minute[4:6])
+    hour, mins = int(minute[7:9]), int(minute[9:11])
+    if hour > 23 or mins > 59:
+        return None
+    year += 2000 if year < 69 else 1900  # Same century pivot as strptime's %y
+    try:
+        ordinal = date(year, month, day).toordinal()
+    except ValueError:
+        return None
+    return (ordinal - EPOCH_ORDINAL) * 86400 + hour * 3600 + mins * 60
+
+def stamp_timestamp(stamp):
+    """
+    Unix time of a "YYMMDD_HHMMSS" stamp (UTC in ALL.TXT), or None if it isn't a valid time.
+
+    Every decode in an FT8 slot shares the same minute, so the date arithmetic is
+    memoized on the "YYMMDD_HHMM" prefix and only the seconds are added per line.
+    """
+    minute = stamp[:11]
+    if minute in minute_epochs:
+        base = minute_epochs[minute]
+    else:
+        if len(minute_epochs) >= MINUTE_CACHE_SIZE:
+            minute_epochs.clear()
+        base = minute_epochs[minute] = minute_epoch(minute)
+    seconds = int(stamp[11:13])
+    if base is None or seconds > 59:
+        return None
+    return base + seconds
+
+def is_int_field(s):
+    return s[1:].isdecimal() if s[0] == "-" else s.isdecimal()
+
+def is_number_field(s):
+    digits = s.replace(".", "")
+    return digits == "" or digits.isdecimal()
+
+def is_signed_number_field(s):
+    return is_number_field(s[1:] if s[0] in "+-" else s)
+
+def match_decode_columns(fields, strict=True):
+    """
+    Find the mode, callsign and grid in the whitespace-split columns of a line.
+
+    An optional "MHz" and then an optional "Rx" may follow the frequency; if the rest
+    of the line doesn't fit with them skipped, they are tried as the mode instead, in
+    the same order a backtracking regex would. Returns (i, call, locator), i being the
+    index of the mode column, with SNR, DT and audio offset after it; or None.
+
+    strict matches exactly what the original regex did, which the uploader's output
+    must keep to. Otherwise a DT may have a sign and the message may start with any
+    word (a hashed "<...>" call, say), and call and locator are left empty.
+    """
+    if not is_number_field(fields[1]):
+        return None
+    if fields[2] == "MHz":
+        starts = (4, 3, 2) if fields[3] == "Rx" else (3, 2)
+    elif fields[2] == "Rx":
+        starts = (3, 2)
+    else:
+        starts = (2,)
+
+    count = len(fields)
+    for i in starts:
+        if i + 4 >= count:
+            continue
+        if not (fields[i + 3].isdecimal() and is_int_field(fields[i + 1])):
+            continue
+        if not strict:
+            if is_signed_number_field(fields[i + 2]):
+                return i, "", ""
+            continue
+        if not is_number_field(fields[i + 2]):
+            continue
+        call_field = fields[i + 4]
+        match = CALL_PREFIX.match(call_field)
+        if not match:
+            continue
+        call = match.group()
+        loc = ""  # Grid might be missing in some decodes
+        if len(call) == len(call_field) and i + 5 < count:
+            match = LOCATOR_PREFIX.match(fields[i + 5])
+            if match:
+                loc = match.group()
+        return i, call, loc
+    return None
+
+def iter_decode_columns(lines, since, strict=True):
+    """
+    Yield (timestamp, frequency_hz, fields, i, call, locator) for each ALL.TXT decode line
+    at or after since, fields being the line split on whitespace and i the index of its
+    mode column (see match_decode_columns, which strict is passed to). Lines are read
+    only as decodes are taken.
+    """
+    since_timestamp = since.timestamp()
+    # Stamps sort in time order, so lines before the window are skipped unparsed
+    since_stamp = since.strftime("%y%m%d_%H%M%S")
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 7:
+            continue
+        stamp = fields[0]
+        if stamp < since_stamp or fields[2] == "Tx":
+            continue
+        if len(stamp) != 13 or stamp[6] != "_" or not (stamp[:6].isdecimal() and stamp[7:].isdecimal()):
+            continue
+
+        decode = match_decode_columns(fields, strict)
+        if decode is None:
+            continue
+        timestamp = stamp_timestamp(stamp)
+        if timestamp is None or timestamp < since_timestamp:
+            continue
+        try:
+            frequency = float(fields[1]) * 1e6
+        except ValueError:
+            continue
+
+        i, call, loc = decode
+        yield timestamp, frequency, fields, i, call, loc
+
+def iter_spots(lines, since):
+    """Yield a Spot for each ALL.TXT decode line at or after since, reading lines only as spots are taken."""
+    # Spot(...) goes through a Python-level __new__; building the tuple directly is twice as fast
+    new_tuple = tuple.__new__
+    sender_from_tokens = WSJTXUdp.sender_from_tokens
+    for timestamp, frequency, fields, i, call, loc in iter_decode_columns(lines, since):
+        sender = sender_from_tokens(fields[i + 4:])
+        yield new_tuple(Spot, (float(timestamp), frequency, fields[i], call, loc, sender[0] if sender else None))
+
+def iter_decodes(lines, since):
+    """
+    Like iter_spots, but yielding Decodes, which also keep the SNR, DT, audio offset and
+    message text. Unlike a Spot's, the sender and grid are read from the message the way
+    the UDP listener reads them, so "CQ K1ABC FN42" and "N0MQL K1ABC -05" are both K1ABC's,
+    and a negative DT is accepted; decodes with no sender in them are skipped, as are
+    damaged lines.
+    """
+    new_tuple = tuple.__new__
+    sender_from_tokens = WSJTXUdp.sender_from_tokens
+    for timestamp, frequency, fields, i, call, loc in iter_decode_columns(lines, since, strict=False):
+        sender = sender_from_tokens(fields[i + 4:])
+        if sender is None:
+            continue
+        message = " ".join(fields[i + 4:])
+        try:
+            snr, dt, audio_offset = int(fields[i + 1]), float(fields[i + 2]), int(fields[i + 3])
+        except ValueError:
+            continue  # A column that passed the shape checks but isn't a number, e.g. "1.2.3"
+        to_call = "" if fields[i + 4] == "CQ" else fields[i + 4].strip("<>")
+        yield new_tuple(Decode, (timestamp, frequency, fields[i], snr, dt, audio_offset,
+                                 sender[0], sender[1], to_call, message))
+
+def parse_lines(lines, since):
+    """Parse ALL.TXT lines into a list of Spots, keeping only decodes at or after since."""
+    return list(iter_spots(lines, since))
+
+def find_window_offset(f, since_stamp):
+    """
+    Binary-search an ALL.TXT opened in binary mode for the first line stamped at or after since_stamp.
+
+    since_stamp is a "YYMMDD_HHMMSS" string; within one century those sort in time order,
+    so stamps are compared as bytes without parsing them. Lines are appended in time order,
+    so this needs about log2(file size) short reads instead of a scan of the whole file.
+    Returns the byte offset to start reading from.
+    """
+    since = since_stamp.encode("ascii")
+
+    def line_start(pos):
+        # Offset of the first line that starts at or after pos
+        if pos == 0:
+            return 0
+        f.seek(pos - 1)
+        f.readline()
+        return f.tell()
+
+    def stamp_from(pos):
+        # Stamp of the first timestamped line at or after pos, or None at end of file
+        f.seek(pos)
+        for raw in f:
+            if raw[6:7] == b"_" and raw[:13].replace(b"_", b"").isdigit():
+                return raw[:13]
+        return None
+
+    size = f.seek(0, os.SEEK_END)
+    lo, hi = 0, size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        stamp = stamp_from(line_start(mid))
+        if stamp is None or stamp >= since:
+            hi = mid
+        else:
+            lo = mid + 1
+    return line_start(lo)
+
+def stream_all_txt(file_path, minutes_ago=60):
+    """
+    Yield the Spots of the last minutes_ago minutes of ALL.TXT, one at a time.
+
+    The file is read as the spots are consumed, so however long the window is, only
+    the line being parsed is held in memory, and a slow consumer slows the reading.
+    """
     if not os.path.exists(file_path):
         print(f"Error: {file_path} not found.")
-        return []
+        return
 
     print(f"Reading {file_path}...")
     since = datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)
-    spots = []
-    
-    # Example lines:
-    # 251222_052015  14.074 Rx FT8    -12  0.3 1245 K1ABC FN42
-    # 251222_052015  14.074 MHz  FT8  -12  0.8  1245 K1ABC FN42
-    
-    # More flexible pattern:
-    # 1: Timestamp (YYMMDD_HHMMSS)
-    # 2: Frequency (MHz)
-    # 3: Mode (FT8, FT4, etc)
-    # 4: SNR
-    # 5: DT
-    # 6: Audio Freq
-    # 7: Callsign
-    # 8: Grid (optional)
-    pattern = re.compile(r"^(\d{6}_\d{6})\s+([\d\.]+)\s+(?:MHz\s+)?(?:Rx\s+)?(\S+)\s+(-?\d+)\s+([\d\.]+)\s+(\d+)\s+([A-Z0-9/]+)(?:\s+([A-Z0-9]+))?")
+    found = 0
 
     try:
-        with open(file_path, "r") as f:
-            for line in f:
-                match = pattern.match(line.strip())
-                if match:
-                    dt_str, freq_mhz, mode, snr, dt, sync, call, loc = match.groups()
-                    if not loc: loc = "" # Grid might be missing in some decodes
-                    try:
-                        # WSJT-X log timestamp is UTC in ALL.TXT
-                        dt_obj = datetime.strptime(dt_str, "%y%m%d_%H%M%S").replace(tzinfo=timezone.utc)
-                        
-                        # DEBUG: print(f"Comparing {dt_obj} >= {since}")
-                        
-                        if dt_obj >= since:
-                            spots.append({
-                                'timestamp': dt_obj.timestamp(),
-                                'frequency': float(freq_mhz) * 1e6,
-                                'mode': mode,
-                                'sender_callsign': call,
-                                'sender_locator': loc
-                            })
-                    except ValueError:
-                        continue
+        with open(file_path, "rb") as f:
+            # Skip straight to the window instead of parsing the whole file
+            f.seek(find_window_offset(f, since.strftime("%y%m%d_%H%M%S")))
+            for spot in iter_spots((raw.decode("utf-8", "replace") for raw in f), since):
+                found += 1
+                yield spot
     except Exception as e:
         print(f"Error reading file: {e}")
 
-    print(f"Found {len(spots)} spots in the last {minutes_ago} minutes.")
-    return spots
+    print(f"Found {found} spots in the last {minutes_ago} minutes.")
+
+def parse_all_txt(file_path, minutes_ago=60):
+    return list(stream_all_txt(file_path, minutes_ago))
+
+class AllTxtTail:
+    """
+    Reads ALL.TXT incrementally, resuming from a persisted byte-offset checkpoint.
+
+    The checkpoint records the inode, device, offset and size of the file as last
+    read, so a rotated (new inode) or truncated (smaller than the offset) file is
+    read again from the start. It also keeps the file's first FINGERPRINT_BYTES
+    (as hex in head), since a deleted and recreated file often gets the old inode
+    back. Only complete lines are consumed; a line WSJT-X is still writing is left
+    for the next read.
+    """
+
+    def __init__(self, file_path, checkpoint_path=None):
+        self.file_path = file_path
+        self.checkpoint_path = checkpoint_path
+        self.device = None
+        self.inode = None
+        self.offset = 0
+        self.size = 0
+        self.head = None
+        self.load()
+
+    def load(self):
+        """Load the checkpoint, if there is one."""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        try:
+            with open(self.checkpoint_path, "r") as f:
+                checkpoint = json.load(f)
+            self.device = checkpoint["device"]
+            self.inode = checkpoint["inode"]
+            self.offset = checkpoint["offset"]
+            self.size = checkpoint["size"]
+            self.head = checkpoint.get("head")  # Not in checkpoints from before it was kept
+        except Exception as e:
+            print(f"Ignoring unreadable checkpoint {self.checkpoint_path}: {e}")
+
+    def save(self):
+        """Persist the current position. Written atomically so a crash can't corrupt it."""
+        if not self.checkpoint_path:
+            return
+        checkpoint = {
+            'device': self.device,
+            'inode': self.inode,
+            'offset': self.offset,
+            'size': self.size,
+            'head': self.head
+        }
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def resume_offset(self, f, st):
+        """Where to start reading f, the open file described by st (an os.stat result)."""
+        if (st.st_dev, st.st_ino) != (self.device, self.inode):
+            if self.inode is not None:
+                print(f"{self.file_path} was rotated; reading from the start.")
+            return 0
+        if st.st_size < self.offset:
+            print(f"{self.file_path} was truncated; reading from the start.")
+            return 0
+        if self.head is not None and self.read_head(f, len(self.head) // 2) != self.head:
+            print(f"{self.file_path} was replaced; reading from the start.")
+            return 0
+        return self.offset
+
+    def read_head(self, f, length):
+        """The first length bytes of f, as hex. Lines before the offset don't change, so neither does this."""
+        f.seek(0)
+        return f.read(length).hex()
+
+    def seek_to_window(self, since):
+        """With no checkpoint yet, start at the first line at or after since instead of byte 0."""
+        try:
+            st = os.stat(self.file_path)
+        except FileNotFoundError:
+            return
+        with open(self.file_path, "rb") as f:
+            self.offset = find_window_offset(f, since.strftime("%y%m%d_%H%M%S"))
+            self.head = self.read_head(f, min(FINGERPRINT_BYTES, self.offset))
+        self.device = st.st_dev
+        self.inode = st.st_ino
+        self.size = st.st_size
+
+    def read_lines(self):
+        """Yield the complete lines added since the checkpoint, advancing the offset as they are read."""
+        try:
+            st = os.stat(self.file_path)
+        except FileNotFoundError:
+            return
+        with open(self.file_path, "rb") as f:
+            offset = self.resume_offset(f, st)
+            self.device = st.st_dev
+            self.inode = st.st_ino
+            self.offset = offset
+
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # WSJT-X is still writing this line
+                self.offset += len(raw)
+                yield raw.decode("utf-8", "replace")
+            length = min(FINGERPRINT_BYTES, self.offset)
+            if offset == 0 or len(self.head or "") < 2 * length:
+                self.head = self.read_head(f, length)
+        self.size = max(st.st_size, self.offset)
+
+    def follow(self, poll_interval=FOLLOW_POLL_SECONDS):
+        """Like tail -F: yield a list of new lines every poll_interval seconds, forever."""
+        while True:
+            yield list(self.read_lines())
+            time.sleep(poll_interval)
+
+def band_for_frequency(frequency_hz):
+    """Band name for a frequency in Hz, or the whole MHz as a string outside the band plan."""
+    frequency_mhz = frequency_hz / 1e6
+    return default_band_plan().band(frequency_mhz) or str(int(frequency_mhz))
+
+class SpotDeduplicator:
+    """
+    Drops spots of a sender already reported recently on the same band and mode.
+
+    PSK Reporter asks clients not to report the same station over and over. Entries are
+    keyed on (heard_callsign, band, mode), sender_callsign standing in when the station
+    heard isn't known, and expire expiry_seconds after the spot that was reported,
+    measured in spot time so backfills behave like live runs. The least recently
+    reported keys are evicted beyond max_entries. With a path, the cache is
+    loaded at start and saved by save(), so it carries over between runs.
+    """
+
+    def __init__(self, expiry_seconds=DEDUP_MINUTES * 60, max_entries=DEDUP_MAX_ENTRIES, path=None):
+        self.expiry_seconds = expiry_seconds
+        self.max_entries = max_entries
+        self.path = path
+        self.entries = OrderedDict()  # key -> timestamp of the last reported spot, oldest first
+        self.dropped = 0
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                for call, band, mode, timestamp in json.load(f):
+                    self.entries[(call, band, mode)] = timestamp
+        except Exception as e:
+            print(f"Ignoring unreadable de-duplication cache {self.path}: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump([[*key, timestamp] for key, timestamp in self.entries.items()], f)
+        os.replace(tmp_path, self.path)
+
+    def expire(self, now):
+        entries = self.entries
+        while entries:
+            key, timestamp = next(iter(entries.items()))
+            if now - timestamp < self.expiry_seconds and len(entries) <= self.max_entries:
+                break
+            entries.popitem(last=False)
+
+    def allow(self, spot):
+        """True if spot should be reported; records it as reported if so."""
+        timestamp = spot.timestamp
+        key = (spot.heard_callsign or spot.sender_callsign, band_for_frequency(spot.frequency), spot.mode)
+        last = self.entries.get(key)
+        if last is not None and 0 <= timestamp - last < self.expiry_seconds:
+            self.dropped += 1
+            return False
+        self.entries[key] = timestamp
+        self.entries.move_to_end(key)
+        self.expire(timestamp)
+        return True
+
+    def stream(self, spots):
+        """Yield the spots that should be reported, pulling from spots one at a time."""
+        before = self.dropped
+        for spot in spots:
+            if self.allow(spot):
+                yield spot
+        if self.dropped > before:
+            print(f"Skipped {self.dropped - before} spots already reported in the last {self.expiry_seconds / 60:g} minutes.")
+
+    def filter(self, spots):
+        return list(self.stream(spots))
+
+def send_one_per_spot(sender, spots, sequence_number):
+    """Send each spot in its own data packet. Returns (packets, bytes) sent."""
+    packets_sent = 0
+    bytes_sent = 0
+    for spot in spots:
+        packets_sent += 1
+        if DEBUG_MODE:
+            print(f"\nSpot {packets_sent}: {spot.sender_callsign} at {spot.frequency/1e6} MHz ({spot.mode})")
+        
+        data_packet = create_data_packet(sequence_number, [spot])
+        
+        if DEBUG_MODE:
+            print(f"Data Packet Length: {len(data_packet)}")
+            print(f"Hex: {data_packet.hex()}")
+        
+        sender.send(data_packet)
+        bytes_sent += len(data_packet)
+            
+        sequence_number = (sequence_number + 1) & 0xFFFFFFFF
+
+    return packets_sent, bytes_sent
+
+def send_batched(sender, spots, sequence_number, max_packet_bytes):
+    """Pack as many spots per data packet as fit in max_packet_bytes. Returns (packets, bytes) sent."""
+    packets_sent = 0
+    bytes_sent = 0
+    for data_packet, count in get_encoder().data_packets(sequence_number, spots, max_packet_bytes):
+        if DEBUG_MODE:
+            print(f"\nPacket {packets_sent+1}: {count} spots, {len(data_packet)} bytes")
+            print(f"Hex: {data_packet.hex()}")
+        
+        sender.send(data_packet)
+        packets_sent += 1
+        bytes_sent += len(data_packet)
+
+    return packets_sent, bytes_sent
+
+def send_template(sender, sequence_number):
+    """Queue the template packet. Returns the next sequence number."""
+    if DEBUG_MODE:
+        print("\n--- Sending Template Packet ---")
+    template_packet = create_template_packet(sequence_number)
+    if DEBUG_MODE:
+        print(f"Template Packet Length: {len(template_packet)}")
+        print(f"Hex: {template_packet.hex()}")
+    
+    sender.send(template_packet)
+    return (sequence_number + 1) & 0xFFFFFFFF
+
+def limit_spots(spots, report_limit):
+    """
+    The latest report_limit of spots (all of them if report_limit is 0).
+
+    spots come in chronological order, so the latest are at the end; they are run
+    through a deque of report_limit entries, so at most that many are held at once.
+    """
+    if report_limit <= 0:
+        return spots
+    total = 0
+    latest = deque(maxlen=report_limit)
+    for spot in spots:
+        total += 1
+        latest.append(spot)
+    if total > report_limit:
+        print(f"Limiting to the latest {report_limit} of {total} spots.")
+    return latest
+
+def report_spots(sender, spots, sequence_number, args):
+    """
+    Send spots, any iterable of Spots, as data packets. Returns the next sequence number.
+
+    Spots are taken from the iterable as they are queued, and the sender's queue is
+    bounded, so a generator upstream is only read as fast as the packets go out.
+    """
+    if DEBUG_MODE:
+        print("\n--- Sending Data Packets ---")
+
+    count = 0
+    def counted(spots):
+        nonlocal count
+        for spot in spots:
+            count += 1
+            yield spot
+
+    if args.batch:
+        packets_sent, bytes_sent = send_batched(sender, counted(spots), sequence_number, args.maxPacketBytes)
+    else:
+        packets_sent, bytes_sent = send_one_per_spot(sender, counted(spots), sequence_number)
+
+    print(f"\nFinished sending {count} reports in {packets_sent} packets ({bytes_sent} bytes).")
+    if args.batch:
+        # The one-per-spot path pays the IPFIX and set headers on every record
+        headers = IPFIX_HEADER_LENGTH + SET_HEADER_LENGTH
+        single_bytes = bytes_sent + (count - packets_sent) * headers
+        print(f"One packet per spot would have been {count} packets ({single_bytes} bytes).")
+
+    return (sequence_number + packets_sent) & 0xFFFFFFFF
+
+def follow_all_txt(sender, tail, dedup, args):
+    """Report new ALL.TXT decodes as they are written, until interrupted."""
+    print(f"Following {tail.file_path} (Ctrl-C to stop)...")
+    sequence_number = int(time.time()) & 0xFFFFFFFF
+    template_sent_at = None
+
+    for lines in tail.follow():
+        since = datetime.now(timezone.utc) - timedelta(minutes=60)
+        spots = list(dedup.stream(limit_spots(iter_spots(lines, since), args.reportLimit)))
+        if spots:
+            if template_sent_at is None or time.monotonic() - template_sent_at >= TEMPLATE_REFRESH_SECONDS:
+                first_template = template_sent_at is None
+                sequence_number = send_template(sender, sequence_number)
+                template_sent_at = time.monotonic()
+                # Small delay to ensure template is processed
+                time.sleep(1)
+                if first_template:
+                    sender.resend_spool()
+            sequence_number = report_spots(sender, spots, sequence_number, args)
+            # Only move the checkpoint once the spots have been sent or spooled
+            sender.flush()
+            dedup.save()
+        if template_sent_at is not None and sender.spool_due():
+            sender.resend_spool()
+        tail.save()
+
+def listen_for_decodes(sender, listener, dedup, args):
+    """Report decodes received from WSJT-X over UDP, until interrupted."""
+    host, port = listener.address
+    print(f"Listening for WSJT-X on {host}:{port} (Ctrl-C to stop)...")
+    sequence_number = int(time.time()) & 0xFFFFFFFF
+    template_sent_at = None
+    pending = []
+    first_pending_at = None
+
+    for spot in listener.spots():
+        if template_sent_at is not None and sender.spool_due():
+            sender.resend_spool()
+        if spot and dedup.allow(spot):
+            if not pending:
+                first_pending_at = time.monotonic()
+            pending.append(spot)
+        if not pending or time.monotonic() - first_pending_at < LISTEN_FLUSH_SECONDS:
+            continue
+
+        if template_sent_at is None or time.monotonic() - template_sent_at >= TEMPLATE_REFRESH_SECONDS:
+            first_template = template_sent_at is None
+            sequence_number = send_template(sender, sequence_number)
+            template_sent_at = time.monotonic()
+            # Small delay to ensure template is processed
+            time.sleep(1)
+            if first_template:
+                sender.resend_spool()
+        sequence_number = report_spots(sender, pending, sequence_number, args)
+        # Only save the cache once the spots have been sent or spooled
+        sender.flush()
+        dedup.save()
+        pending = []
 
 def main():
     parser = argparse.ArgumentParser(description="Send WSJT-X spots from ALL.TXT to PSK Reporter for debugging.")
     parser.add_argument("--reportLimit", type=int, default=0, help="Limit the number of latest spots to send (0 = all).")
+    parser.add_argument("--batch", action="store_true", help="Pack as many spots per packet as fit in --maxPacketBytes.")
+    parser.add_argument("--maxPacketBytes", type=int, default=MAX_PACKET_BYTES, help=f"Datagram size budget for --batch, {DATA_OFFSET} to {UDP_MAX_PAYLOAD} (default {MAX_PACKET_BYTES}).")
+    parser.add_argument("--checkpoint", nargs="?", const=CHECKPOINT_PATH, default=None,
+                        help=f"Only read ALL.TXT lines added since the last run, tracked in this file (default {CHECKPOINT_PATH}).")
+    parser.add_argument("--follow", action="store_true", help="Keep running and report new decodes as they are written (implies --checkpoint).")
+    parser.add_argument("--listen", nargs="?", const=f"{WSJTXUdp.WSJTX_HOST}:{WSJTXUdp.WSJTX_PORT}", default=None,
+                        help=f"Take decodes straight from WSJT-X's UDP messages instead of ALL.TXT (default {WSJTXUdp.WSJTX_HOST}:{WSJTXUdp.WSJTX_PORT}).")
+    parser.add_argument("--dedupMinutes", type=float, default=DEDUP_MINUTES,
+                        help=f"Skip a sender already reported on the same band and mode within this many minutes (0 = off, default {DEDUP_MINUTES}).")
+    parser.add_argument("--dedupCache", nargs="?", const=DEDUP_CACHE_PATH, default=None,
+                        help=f"Keep the de-duplication cache between runs in this file (default {DEDUP_CACHE_PATH}).")
+    parser.add_argument("--server", default=f"{PSK_REPORTER_HOST}:{PSK_REPORTER_PORT}",
+                        help=f"Where to send the packets, host:port (default {PSK_REPORTER_HOST}:{PSK_REPORTER_PORT}).")
+    parser.add_argument("--spool", default=SPOOL_PATH, help=f"Keep packets that couldn't be sent in this file to send again later (default {SPOOL_PATH}).")
+    parser.add_argument("--noSpool", action="store_true", help="Drop packets that couldn't be sent instead of spooling them.")
     args = parser.parse_args()
+    if not DATA_OFFSET <= args.maxPacketBytes <= UDP_MAX_PAYLOAD:
+        parser.error(f"--maxPacketBytes must be from {DATA_OFFSET} to {UDP_MAX_PAYLOAD}, the largest UDP datagram")
 
     if RECEIVER_CALLSIGN == "REPLACE_ME":
         print("Please configure your CALLSIGN and GRID in the script.")
         return
 
-    spots = parse_all_txt(ALL_TXT_PATH)
-    
-    if not spots:
-        print("No new spots to report.")
+    dedup = SpotDeduplicator(args.dedupMinutes * 60, path=args.dedupCache)
+    server_host, _, server_port = args.server.rpartition(":")
+    spool_path = None if args.noSpool else args.spool
+
+    if args.listen:
+        host, _, port = args.listen.rpartition(":")
+        listener = WSJTXUdp.SpotListener(host or WSJTXUdp.WSJTX_HOST, int(port))
+        sender = PSKReporterSender(server_host, int(server_port), spool_path=spool_path, debug=DEBUG_MODE)
+        try:
+            listen_for_decodes(sender, listener, dedup, args)
+        except KeyboardInterrupt:
+            print("\nStopped listening.")
+        finally:
+            listener.close()
+            sender.close(resend=False)
         return
 
-    # Apply limit if specified
-    if args.reportLimit > 0:
-        # spots are added in chronological order, so the latest are at the end
-        if len(spots) > args.reportLimit:
-            print(f"Limiting to the latest {args.reportLimit} spots.")
-            spots = spots[-args.reportLimit:]
+    if args.follow and not args.checkpoint:
+        args.checkpoint = CHECKPOINT_PATH
+
+    tail = None
+    if args.checkpoint:
+        tail = AllTxtTail(ALL_TXT_PATH, args.checkpoint)
+        if tail.inode is None:
+            tail.seek_to_window(datetime.now(timezone.utc) - timedelta(minutes=60))
+
+    if args.follow:
+        sender = PSKReporterSender(server_host, int(server_port), spool_path=spool_path, debug=DEBUG_MODE)
+        try:
+            follow_all_txt(sender, tail, dedup, args)
+        except KeyboardInterrupt:
+            print("\nStopped following.")
+        finally:
+            sender.close(resend=False)
+        return
+
+    # Parse, limit and de-duplicate lazily: nothing is read until the sender pulls
+    # spots, and only --reportLimit spots are ever held at once. The limit comes
+    # first, so a spot it drops isn't recorded as reported
+    if tail:
+        print(f"Reading {ALL_TXT_PATH} from byte {tail.offset}...")
+        since = datetime.now(timezone.utc) - timedelta(minutes=60)
+        spots = iter_spots(tail.read_lines(), since)
+    else:
+        spots = stream_all_txt(ALL_TXT_PATH)
+    spots = dedup.stream(limit_spots(spots, args.reportLimit))
+
+    first = next(spots, None)
+    if first is None:
+        print("No new spots to report.")
+        if tail:
+            tail.save()
+        return
+    spots = itertools.chain([first], spots)
 
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender = PSKReporterSender(server_host, int(server_port), spool_path=spool_path, debug=DEBUG_MODE)
     sequence_number = int(time.time()) & 0xFFFFFFFF
     
     # 1. Send Template
-    if DEBUG_MODE:
-        print("\n--- Sending Template Packet ---")
-    template_packet = create_template_packet(sequence_number)
-    if DEBUG_MODE:
-        print(f"Template Packet Length: {len(template_packet)}")
-        print(f"Hex: {template_packet.hex()}")
-    
-    sock.sendto(template_packet, (PSK_REPORTER_HOST, PSK_REPORTER_PORT))
-    sequence_number = (sequence_number + 1) & 0xFFFFFFFF
+    sequence_number = send_template(sender, sequence_number)
     
     # Small delay to ensure template is processed
     time.sleep(1)
+    sender.resend_spool()
     
     # 2. Send Data
-    if DEBUG_MODE:
-        print(f"\n--- Sending Data Packets for {len(spots)} spots ---")
-    
-    for i, spot in enumerate(spots):
-        if DEBUG_MODE:
-            print(f"\nSpot {i+1}/{len(spots)}: {spot['sender_callsign']} at {spot['frequency']/1e6} MHz ({spot['mode']})")
-        
-        data_packet = create_data_packet(sequence_number, [spot])
-        
-        if DEBUG_MODE:
-            print(f"Data Packet Length: {len(data_packet)}")
-            print(f"Hex: {data_packet.hex()}")
-        
-        try:
-            sock.sendto(data_packet, (PSK_REPORTER_HOST, PSK_REPORTER_PORT))
-            if DEBUG_MODE:
-                print("Packet sent successfully to UDP socket.")
-        except Exception as e:
-            print(f"Error sending packet: {e}")
-            
-        sequence_number = (sequence_number + 1) & 0xFFFFFFFF
-        # PSK Reporter recommends a small gap
-        time.sleep(0.2) 
+    report_spots(sender, spots, sequence_number, args)
 
-    print(f"\nFinished sending {len(spots)} reports.")
+    # Only move the checkpoint once the spots have been sent or spooled
+    sender.close()
+    dedup.save()
+    if tail:
+        tail.save()
 
 if __name__ == "__main__":
     main()
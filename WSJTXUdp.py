@@ -0,0 +1,320 @@
+"""
+WSJT-X UDP message protocol: decode the Status and Decode messages WSJT-X sends,
+and encode them for the replay tool.
+
+Messages are Qt QDataStream encoded: big-endian integers, utf8 strings as a
+quint32 length (0xffffffff for null) followed by the bytes, and QTime as
+milliseconds since midnight UTC. See NetworkMessage.hpp in the WSJT-X sources.
+"""
+import re
+import socket
+import struct
+from datetime import datetime, timedelta, timezone
+
+from Spot import Spot
+
+WSJTX_HOST = "127.0.0.1"  # WSJT-X Settings > Reporting > UDP Server
+WSJTX_PORT = 2237         # WSJT-X default UDP server port
+
+MAGIC = 0xADBCCBDA
+SCHEMA = 2
+
+# Message types
+MSG_HEARTBEAT = 0
+MSG_STATUS = 1
+MSG_DECODE = 2
+
+# Mode characters used in Decode messages
+MODE_CHARS = {
+    "~": "FT8",
+    "+": "FT4",
+    "`": "FST4",
+    "#": "JT65",
+    "@": "JT9",
+    ":": "Q65",
+    "&": "MSK144",
+}
+MODE_TO_CHAR = {mode: char for char, mode in MODE_CHARS.items()}
+
+GRID_PATTERN = re.compile(r"^[A-R]{2}[0-9]{2}([a-x]{2})?$")
+CALL_PATTERN = re.compile(r"^(?=.*[0-9])(?=.*[A-Z])[A-Z0-9/]{3,}$")
+WORD_OTHER, WORD_CALL, WORD_GRID = 0, 1, 2
+MAX_WORD_KINDS = 65536
+word_kinds = {}  # Message word -> WORD_CALL, WORD_GRID or WORD_OTHER
+
+class Reader:
+    """Sequential reader for QDataStream fields."""
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def unpack(self, fmt):
+        values = struct.unpack_from(fmt, self.data, self.pos)
+        self.pos += struct.calcsize(fmt)
+        return values[0]
+
+    def uint8(self):
+        return self.unpack(">B")
+
+    def uint32(self):
+        return self.unpack(">I")
+
+    def int32(self):
+        return self.unpack(">i")
+
+    def uint64(self):
+        return self.unpack(">Q")
+
+    def bool(self):
+        return self.unpack(">?")
+
+    def double(self):
+        return self.unpack(">d")
+
+    def utf8(self):
+        length = self.uint32()
+        if length == 0xFFFFFFFF:
+            return None
+        value = self.data[self.pos:self.pos + length]
+        if len(value) != length:
+            raise struct.error("string runs past end of message")
+        self.pos += length
+        return value.decode("utf-8", "replace")
+
+class Writer:
+    """Builds QDataStream fields, the inverse of Reader."""
+
+    def __init__(self):
+        self.parts = []
+
+    def pack(self, fmt, value):
+        self.parts.append(struct.pack(fmt, value))
+
+    def utf8(self, value):
+        if value is None:
+            self.pack(">I", 0xFFFFFFFF)
+        else:
+            b = value.encode("utf-8")
+            self.pack(">I", len(b))
+            self.parts.append(b)
+
+    def bytes(self):
+        return b"".join(self.parts)
+
+def message_header(writer, message_type, client_id):
+    writer.pack(">I", MAGIC)
+    writer.pack(">I", SCHEMA)
+    writer.pack(">I", message_type)
+    writer.utf8(client_id)
+
+def encode_status(client_id, dial_frequency, mode, de_call="", de_grid=""):
+    """A Status message with the fields the listener uses; the rest are left empty."""
+    w = Writer()
+    message_header(w, MSG_STATUS, client_id)
+    w.pack(">Q", int(dial_frequency))
+    w.utf8(mode)
+    w.utf8("")           # DX call
+    w.utf8("")           # Report
+    w.utf8(mode)         # Tx mode
+    w.pack(">?", False)  # Tx enabled
+    w.pack(">?", False)  # Transmitting
+    w.pack(">?", False)  # Decoding
+    w.pack(">I", 0)      # Rx DF
+    w.pack(">I", 0)      # Tx DF
+    w.utf8(de_call)
+    w.utf8(de_grid)
+    w.utf8("")           # DX grid
+    w.pack(">?", False)  # Tx watchdog
+    w.utf8("")           # Sub-mode
+    w.pack(">?", False)  # Fast mode
+    w.pack(">B", 0)      # Special operation mode
+    w.pack(">I", 0)      # Frequency tolerance
+    w.pack(">I", 15)     # T/R period
+    w.utf8("")           # Configuration name
+    w.utf8("")           # Tx message
+    return w.bytes()
+
+def encode_decode(client_id, time_ms, snr, delta_time, delta_frequency, mode, message, new=True):
+    """A Decode message. mode is the WSJT-X mode name, e.g. "FT8"."""
+    w = Writer()
+    message_header(w, MSG_DECODE, client_id)
+    w.pack(">?", new)
+    w.pack(">I", time_ms)
+    w.pack(">i", snr)
+    w.pack(">d", delta_time)
+    w.pack(">I", delta_frequency)
+    w.utf8(MODE_TO_CHAR.get(mode, mode))
+    w.utf8(message)
+    w.pack(">?", False)  # Low confidence
+    w.pack(">?", False)  # Off air
+    return w.bytes()
+
+def decode_message(data):
+    """
+    Decode a datagram from WSJT-X.
+
+    Returns (message_type, fields) for Status and Decode messages, (message_type, None)
+    for other message types, or None if the datagram isn't a WSJT-X message.
+    """
+    try:
+        r = Reader(data)
+        if r.uint32() != MAGIC:
+            return None
+        r.uint32()  # Schema
+        message_type = r.uint32()
+        client_id = r.utf8()
+
+        if message_type == MSG_STATUS:
+            return message_type, {
+                'id': client_id,
+                'dial_frequency': r.uint64(),
+                'mode': r.utf8(),
+            }
+        if message_type == MSG_DECODE:
+            fields = {'id': client_id}
+            fields['new'] = r.bool()
+            fields['time_ms'] = r.uint32()
+            fields['snr'] = r.int32()
+            fields['delta_time'] = r.double()
+            fields['delta_frequency'] = r.uint32()
+            fields['mode'] = r.utf8()
+            fields['message'] = r.utf8()
+            fields['low_confidence'] = r.bool()
+            fields['off_air'] = r.bool()
+            return message_type, fields
+        return message_type, None
+    except struct.error:
+        return None
+
+def sender_from_message(message):
+    """
+    Pull (sender_callsign, sender_locator) out of a decoded message's text.
+
+    Standard messages are "CQ [modifier] CALL [GRID]" or "TO FROM [GRID|report|RR73]".
+    Returns None when there is no sender worth reporting.
+    """
+    return sender_from_tokens((message or "").split())
+
+def word_kind(word):
+    """
+    WORD_CALL, WORD_GRID or WORD_OTHER for one word of a message. The same calls and
+    grids are decoded over and over, so the answers are memoized, like the encoder's
+    packed strings, instead of running the patterns on every line of a backfill.
+    """
+    kind = word_kinds.get(word)
+    if kind is None:
+        if len(word_kinds) >= MAX_WORD_KINDS:
+            word_kinds.clear()
+        if GRID_PATTERN.match(word):
+            kind = WORD_GRID
+        elif CALL_PATTERN.match(word):
+            kind = WORD_CALL
+        else:
+            kind = WORD_OTHER
+        word_kinds[word] = kind
+    return kind
+
+def sender_from_tokens(tokens):
+    """sender_from_message for a message already split into words."""
+    if len(tokens) < 2:
+        return None
+    if tokens[0] == "CQ":
+        # "CQ DX K1ABC FN42", "CQ NA K1ABC FN42", "CQ 123 K1ABC FN42"
+        i = 2 if len(tokens) > 2 and word_kind(tokens[1]) == WORD_OTHER else 1
+    else:
+        i = 1
+    call = tokens[i].strip("<>")
+    if word_kind(call) != WORD_CALL:
+        return None
+    grid = tokens[i + 1] if i + 1 < len(tokens) else ""
+    if grid == "RR73" or word_kind(grid) != WORD_GRID:
+        grid = ""
+    return call, grid
+
+def decode_timestamp(time_ms, now=None):
+    """Turn a QTime (ms since midnight UTC) into a Unix timestamp near now."""
+    if now is None:
+        now = datetime.now(timezone.utc)
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    stamp = midnight + timedelta(milliseconds=time_ms)
+    if stamp > now + timedelta(hours=12):
+        stamp -= timedelta(days=1)  # Decoded just before midnight, received just after
+    return stamp.timestamp()
+
+class SpotListener:
+    """
+    Listens for WSJT-X UDP messages and turns new decodes into Spots.
+
+    The dial frequency and mode come from the latest Status message from each WSJT-X
+    instance, so decodes are skipped until that instance has sent one.
+    """
+
+    def __init__(self, host=WSJTX_HOST, port=WSJTX_PORT, timeout=1.0):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if socket.inet_aton(host)[0] in range(224, 240):
+            # Multicast lets WSJT-X share its messages with other listeners
+            self.sock.bind(("", port))
+            membership = socket.inet_aton(host) + socket.inet_aton("0.0.0.0")
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        else:
+            self.sock.bind((host, port))
+        self.sock.settimeout(timeout)
+        self.status = {}
+
+    @property
+    def address(self):
+        return self.sock.getsockname()
+
+    def handle(self, data):
+        """Process one datagram. Returns a Spot, or None."""
+        message = decode_message(data)
+        if not message:
+            return None
+        message_type, fields = message
+
+        if message_type == MSG_STATUS:
+            self.status[fields['id']] = fields
+            return None
+        if message_type != MSG_DECODE:
+            return None
+        if not fields['new'] or fields['off_air']:
+            return None  # Replayed or recorded decodes, not on-air reception
+
+        status = self.status.get(fields['id'])
+        if not status:
+            return None
+        sender = sender_from_message(fields['message'])
+        if not sender:
+            return None
+
+        call, grid = sender
+        return Spot(
+            decode_timestamp(fields['time_ms']),
+            status['dial_frequency'] + fields['delta_frequency'],
+            status['mode'] or MODE_CHARS.get(fields['mode'], fields['mode']),
+            call,
+            grid,
+            call
+        )
+
+    def spots(self):
+        """
+        Yield Spots as decodes arrive, forever.
+
+        Yields None whenever the socket has been quiet for the timeout, so callers can
+        flush pending work without a spot to trigger it.
+        """
+        while True:
+            try:
+                data, _ = self.sock.recvfrom(65535)
+            except socket.timeout:
+                yield None
+                continue
+            spot = self.handle(data)
+            if spot:
+                yield spot
+
+    def close(self):
+        self.sock.close()
@@ -0,0 +1,104 @@
+"""
+Measures the flrig polling and switching paths against FakeFlrig, so no radio is needed.
+
+    python3 benchmarks/FlrigBenchmark.py                 # no added latency
+    python3 benchmarks/FlrigBenchmark.py --latency 5     # 5 ms per request, like flrig on a LAN
+    python3 benchmarks/FlrigBenchmark.py --rigs 20       # concurrent async polling of 20 fake rigs
+
+Results are repeatable for a given --seed, since FakeFlrig's jitter and failures come
+from a seeded generator.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from AsyncFlrigClient import AsyncFlrigClient
+from FakeFlrig import FakeFlrig
+
+# A switch to 60m on the split GUI: split off, ANT1, 15W, IPO
+SWITCH_COMMANDS = [("rig.set_split", (0,)), ("rig.cmd", (1,)), ("rig.cmd", (6,)), ("rig.cmd", (10,))]
+
+
+def start_fake(args, seed_offset=0):
+    seed = None if args.seed is None else args.seed + seed_offset
+    server = FakeFlrig("127.0.0.1", 0, latency=args.latency / 1000, jitter=args.jitter / 1000, seed=seed)
+    return server, server.start()
+
+
+def report(name, seconds, count, stats):
+    print(f"{name:28s} {count / seconds:9.0f} /s   mean {stats.mean * 1000:6.2f} ms   "
+          f"p95 {stats.percentile(0.95) * 1000:6.2f} ms")
+
+
+async def bench_polling(address, count):
+    client = AsyncFlrigClient(*address)
+    start = time.perf_counter()
+    for _ in range(count):
+        float(await client.call("rig.get_vfoA"))
+    report("Poll rig.get_vfoA", time.perf_counter() - start, count, client.stats)
+    client.close()
+
+
+async def bench_switching(address, count):
+    client = AsyncFlrigClient(*address)
+    start = time.perf_counter()
+    for _ in range(count):
+        for method, args in SWITCH_COMMANDS:
+            await client.call(method, *args)
+    report("Switch, one call each", time.perf_counter() - start, count, client.stats)
+    client.close()
+
+    client = AsyncFlrigClient(*address)
+    start = time.perf_counter()
+    for _ in range(count):
+        await client.multicall(SWITCH_COMMANDS)
+    report("Switch, one multicall", time.perf_counter() - start, count, client.stats)
+    client.close()
+
+
+async def poll_async(client, count):
+    for _ in range(count):
+        float(await client.call("rig.get_vfoA"))
+
+
+async def bench_async_polling(addresses, count):
+    clients = [AsyncFlrigClient(*address) for address in addresses]
+    start = time.perf_counter()
+    await asyncio.gather(*(poll_async(client, count) for client in clients))
+    seconds = time.perf_counter() - start
+    total = len(clients) * count
+    worst_p95 = max(client.stats.percentile(0.95) for client in clients)
+    mean = sum(client.stats.total for client in clients) / total
+    print(f"{f'Async poll, {len(clients)} rigs':28s} {total / seconds:9.0f} /s   mean {mean * 1000:6.2f} ms   "
+          f"p95 {worst_p95 * 1000:6.2f} ms (worst rig)")
+    for client in clients:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark flrig polling and switching against a fake flrig.")
+    parser.add_argument("--count", type=int, default=500, help="Polls or switches per measurement (default 500).")
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake flrig latency per request in ms (default 0).")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency per request in ms (default 0).")
+    parser.add_argument("--rigs", type=int, default=10, help="Fake rigs for the async polling run (default 10).")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the fake flrig's jitter (default 1).")
+    args = parser.parse_args()
+
+    servers = [start_fake(args, i) for i in range(args.rigs)]
+    try:
+        address = servers[0][1]
+        asyncio.run(bench_polling(address, args.count))
+        asyncio.run(bench_switching(address, args.count // 4 or 1))
+        asyncio.run(bench_async_polling([address for server, address in servers], args.count // args.rigs or 1))
+    finally:
+        for server, address in servers:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Checks the ALL.TXT line parser against the original regex and strptime parser, and
+that it finds the station actually heard in CQ and report lines, then compares their
+speed.
+
+    python3 benchmarks/ParserBenchmark.py --sizeMB 50
+
+Exits non-zero if the two parsers disagree on any line of the corpus.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import WSJTXToPSKReporter as reporter
+from Spot import Spot
+from SyntheticAllTxt import corpus, write_synthetic_all_txt
+
+PATTERN = re.compile(r"^(\d{6}_\d{6})\s+([\d\.]+)\s+(?:MHz\s+)?(?:Rx\s+)?(\S+)\s+(-?\d+)\s+([\d\.]+)\s+(\d+)\s+([A-Z0-9/]+)(?:\s+([A-Z0-9]+))?")
+
+
+def regex_parse_lines(lines, since):
+    """The original parse_all_txt loop, building Spots instead of dicts so the results compare."""
+    spots = []
+    for line in lines:
+        match = PATTERN.match(line.strip())
+        if match:
+            dt_str, freq_mhz, mode, snr, dt, sync, call, loc = match.groups()
+            if not loc: loc = ""
+            try:
+                dt_obj = datetime.strptime(dt_str, "%y%m%d_%H%M%S").replace(tzinfo=timezone.utc)
+                if dt_obj >= since:
+                    spots.append(Spot(dt_obj.timestamp(), float(freq_mhz) * 1e6, mode, call, loc))
+            except ValueError:
+                continue
+    return spots
+
+
+def uploaded(spots):
+    """The fields the original parser produced; heard_callsign is new."""
+    return [spot[:5] for spot in spots]
+
+
+# (line, station heard): CQ, CQ with a modifier, report, RR73, hashed call, free text
+HEARD_LINES = [
+    ("251222_054500    14.074 Rx FT8    -10  0.2 1234 CQ K1ABC FN42", "K1ABC"),
+    ("251222_054500    14.074 Rx FT8    -12  0.1 1534 CQ DX W9XYZ EN50", "W9XYZ"),
+    ("251222_054500    14.074 Rx FT8     -5  0.1 1500 N0MQL K1DEF -05", "K1DEF"),
+    ("251222_054500  14.074 MHz  FT8  -3  0.3  900 W1AW G4XYZ RR73", "G4XYZ"),
+    ("251222_054500    14.074 Rx FT8     -7  0.4 2100 K1ABC <PJ4/K1XYZ> R-12", "PJ4/K1XYZ"),
+    ("251222_054500    14.074 Rx FT8     -9  0.3 2200 TNX BOB 73 GL", None),
+]
+
+
+def check_heard():
+    """Every CQ caller and reporting station is its own de-duplication key."""
+    since = datetime(2000, 1, 1, tzinfo=timezone.utc)
+    ok = True
+    for line, heard in HEARD_LINES:
+        spots = reporter.parse_lines([line], since)
+        if not spots or spots[0].heard_callsign != heard:
+            ok = False
+            print(f"HEARD MISMATCH: {line!r} gave {spots[0].heard_callsign if spots else 'no spot'}, expected {heard}")
+    spots = reporter.parse_lines([line for line, heard in HEARD_LINES if heard], since)
+    allowed = reporter.SpotDeduplicator().filter(spots)
+    if len(allowed) != len(spots):
+        ok = False
+        print(f"DEDUP MISMATCH: {len(allowed)} of {len(spots)} different stations allowed")
+    if ok:
+        print(f"{len(HEARD_LINES)} CQ and report lines: stations heard and de-duplication keys right")
+    return ok
+
+
+def check_equivalence(lines):
+    """Compare both parsers with windows before, inside and after the corpus."""
+    windows = [
+        datetime(2000, 1, 1, tzinfo=timezone.utc),
+        datetime(2025, 12, 22, 5, 30, 7, 250000, tzinfo=timezone.utc),
+        datetime(2025, 12, 22, 5, 45, tzinfo=timezone.utc),
+        datetime(2030, 1, 1, tzinfo=timezone.utc),
+    ]
+    ok = True
+    for since in windows:
+        expected = uploaded(regex_parse_lines(lines, since))
+        actual = uploaded(reporter.parse_lines(lines, since))
+        if expected != actual:
+            ok = False
+            print(f"MISMATCH since {since}: regex {len(expected)} spots, parser {len(actual)} spots")
+            for line in lines:
+                if uploaded(regex_parse_lines([line], since)) != uploaded(reporter.parse_lines([line], since)):
+                    print(f"  {line!r}")
+        else:
+            print(f"since {since}: {len(actual)} spots, identical")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and benchmark the ALL.TXT line parser.")
+    parser.add_argument("--sizeMB", type=int, default=50, help="Size of the synthetic log to time (default 50).")
+    args = parser.parse_args()
+
+    if not check_heard() or not check_equivalence(corpus(20000)):
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "ALL.TXT")
+        write_synthetic_all_txt(path, args.sizeMB * 1024 * 1024)
+        with open(path, "r") as f:
+            lines = f.readlines()
+
+    since = datetime(2000, 1, 1, tzinfo=timezone.utc)  # Parse everything, no early skips
+    results = {}
+    for name, func in (("Regex + strptime", regex_parse_lines), ("Fast path", reporter.parse_lines)):
+        start = time.perf_counter()
+        results[name] = func(lines, since)
+        elapsed = time.perf_counter() - start
+        print(f"{name:18} {elapsed:8.3f} s  {len(lines) / elapsed:12,.0f} lines/sec")
+
+    if uploaded(results["Regex + strptime"]) != uploaded(results["Fast path"]):
+        print("MISMATCH on the synthetic log")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
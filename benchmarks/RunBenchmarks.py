@@ -0,0 +1,287 @@
+"""
+Runs the hot-path benchmarks and compares them with the committed baselines.
+
+    python3 benchmarks/RunBenchmarks.py                    # everything, incl. a 1 GB ALL.TXT
+    python3 benchmarks/RunBenchmarks.py --sizes 10,100     # skip the 1 GB file
+    python3 benchmarks/RunBenchmarks.py --only band_lookup,switch_cycle
+    python3 benchmarks/RunBenchmarks.py --update           # write the results as the new baselines
+
+Each case is timed (best of --repeats runs), then run once more under tracemalloc for
+its peak memory. That run also counts the memory blocks still allocated after it
+(leaked_blocks), which shows leaks and growing caches; it is not a count of the
+allocations the case made, most of which are freed again. The run fails
+(exit status 1) when a case is more than --timeThreshold slower, or peaks more than
+--memoryThreshold higher, than its baseline in baselines.json. Baselines are only
+comparable on the machine that recorded them, so re-record them with --update when
+moving to another one.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import WSJTXToPSKReporter as reporter
+from AntennaEngine import AntennaEngine
+from AsyncFlrigClient import AsyncFlrigClient
+from BandPlan import BandPlan
+from EncoderBenchmark import make_spots
+from FakeFlrig import FakeFlrig
+from RigPolicy import PolicyEngine, RigPolicy
+from SyntheticAllTxt import BANDS_MHZ, write_synthetic_all_txt
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+SIZES_MB = (10, 100, 1024)
+TIME_THRESHOLD = 0.50    # Fail when a case takes 50% longer than its baseline (timings on a busy machine vary)...
+MEMORY_THRESHOLD = 0.20  # ...or peaks 20% higher
+MEMORY_SLACK_KB = 64     # Peak increases smaller than this are never a regression
+
+
+class Case:
+    """
+    One benchmark. setup() runs once, untimed, and returns what run() needs; run(state)
+    does the measured work and returns (operations, extras), extras being a dict of
+    figures to report alongside the timings, like packet counts.
+    """
+
+    def __init__(self, name, unit, setup, run, teardown=None):
+        self.name = name
+        self.unit = unit
+        self.setup = setup
+        self.run = run
+        self.teardown = teardown
+
+
+def parse_case(size_mb, tmp_dir):
+    def setup():
+        path = os.path.join(tmp_dir, f"ALL_{size_mb}MB.TXT")
+        if not os.path.exists(path):
+            print(f"Writing a {size_mb} MB synthetic ALL.TXT...")
+            write_synthetic_all_txt(path, size_mb * 1024 * 1024)
+        return path
+
+    def run(path):
+        with contextlib.redirect_stdout(io.StringIO()):
+            spots = reporter.parse_all_txt(path, 60)
+        return len(spots), {"spots": len(spots)}
+
+    return Case(f"parse_all_txt_{size_mb}MB", "spots", setup, run)
+
+
+def parse_lines_case(tmp_dir):
+    """Raw parser throughput: every line of a 10 MB file, no time window."""
+    def setup():
+        path = os.path.join(tmp_dir, "ALL_10MB.TXT")
+        if not os.path.exists(path):
+            write_synthetic_all_txt(path, 10 * 1024 * 1024)
+        with open(path, "r") as f:
+            return f.readlines()
+
+    def run(lines):
+        reporter.parse_lines(lines, datetime(2000, 1, 1, tzinfo=timezone.utc))
+        return len(lines), {}
+
+    return Case("parse_lines_10MB", "lines", setup, run)
+
+
+def encode_cases():
+    def setup():
+        spots = make_spots(100000)
+        return spots, [spots[i:i + 15] for i in range(0, len(spots), 15)]
+
+    def run_create(state):
+        spots, groups = state
+        for group in groups:
+            reporter.create_data_packet(1, group)
+        return len(spots), {"packets": len(groups)}
+
+    def run_batched(state):
+        spots, groups = state
+        packets = sum(1 for packet in reporter.get_encoder().data_packets(1, spots, reporter.MAX_PACKET_BYTES))
+        return len(spots), {"packets": packets}
+
+    return [Case("create_data_packet", "records", setup, run_create),
+            Case("data_packets_batched", "records", setup, run_batched)]
+
+
+def band_lookup_case():
+    def setup():
+        rng = random.Random(1)
+        # Mostly repeats of the current band, as the pollers see, with some hops and out-of-band values
+        frequencies = []
+        freq = float(rng.choice(BANDS_MHZ))
+        for i in range(200000):
+            if rng.random() < 0.01:
+                freq = float(rng.choice(BANDS_MHZ)) if rng.random() < 0.9 else rng.uniform(0.1, 60.0)
+            frequencies.append(freq + rng.uniform(0, 0.003))
+        return BandPlan.for_region(), frequencies
+
+    def run(state):
+        band_plan, frequencies = state
+        band = band_plan.band
+        for frequency in frequencies:
+            band(frequency)
+        return len(frequencies), {}
+
+    return Case("band_lookup", "lookups", setup, run)
+
+
+def policy_plan_case():
+    def setup():
+        policy = RigPolicy.for_script("AntennaPortForBandSplitGUI")
+        bands = [random.Random(i).choice(list(policy.bands)) for i in range(50000)]
+        return policy, bands
+
+    def run(state):
+        policy, bands = state
+        engine = PolicyEngine(policy)
+        for band in bands:
+            desired, changes = engine.plan(band, {"split": 0})
+            engine.commands(changes)
+            engine.applied(band, desired)
+        return len(bands), {}
+
+    return Case("policy_plan", "plans", setup, run)
+
+
+def switch_cycle_case(cycles=200):
+    """Full poll-and-switch cycles of AntennaEngine against FakeFlrig, changing band every cycle."""
+    def setup():
+        server = FakeFlrig("127.0.0.1", 0)
+        server.start()
+        return server
+
+    async def cycles_against(server):
+        host, port = server.server_address
+        engine = AntennaEngine(AsyncFlrigClient(host, port), RigPolicy.for_script("AntennaPortForBandSplitGUI"))
+        frequencies = (14074000, 1840000, 5357000, 7074000)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(cycles):
+                server.rig.set_vfoA(frequencies[i % len(frequencies)])
+                await engine.cycle()
+        engine.client.close()
+        return engine
+
+    def run(server):
+        commands = server.rig.commands
+        engine = asyncio.run(cycles_against(server))
+        return cycles, {"commands": server.rig.commands - commands, "flrig_calls": engine.client.stats.calls}
+
+    def teardown(server):
+        server.shutdown()
+        server.server_close()
+
+    return Case("switch_cycle", "cycles", setup, run, teardown)
+
+
+def measure(case, repeats):
+    state = case.setup()
+    try:
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            ops, extras = case.run(state)
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+
+        blocks_before = sys.getallocatedblocks()
+        tracemalloc.start()
+        case.run(state)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        leaked_blocks = sys.getallocatedblocks() - blocks_before
+    finally:
+        if case.teardown:
+            case.teardown(state)
+
+    result = {
+        "seconds": round(best, 6),
+        "unit": case.unit,
+        "per_second": round(ops / best, 1) if best else None,
+        "peak_kb": round(peak / 1024, 1),
+        "leaked_blocks": leaked_blocks,
+    }
+    result.update(extras)
+    return result
+
+
+def regressions(name, result, baseline, time_threshold, memory_threshold):
+    problems = []
+    if result["seconds"] > baseline["seconds"] * (1 + time_threshold):
+        problems.append(f"{name}: {result['seconds']:.4f} s vs baseline {baseline['seconds']:.4f} s")
+    allowed_kb = max(baseline["peak_kb"] * (1 + memory_threshold), baseline["peak_kb"] + MEMORY_SLACK_KB)
+    if result["peak_kb"] > allowed_kb:
+        problems.append(f"{name}: peak {result['peak_kb']:.0f} KB vs baseline {baseline['peak_kb']:.0f} KB")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parse, encode and poll hot paths against baselines.")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in SIZES_MB),
+                        help="Synthetic ALL.TXT sizes in MB for parse_all_txt (default 10,100,1024).")
+    parser.add_argument("--only", help="Comma-separated case names to run (default all).")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per case; the best counts (default 5).")
+    parser.add_argument("--baselines", default=BASELINES_PATH, help="Baselines file (default benchmarks/baselines.json).")
+    parser.add_argument("--update", action="store_true", help="Record these results as the baselines instead of comparing.")
+    parser.add_argument("--timeThreshold", type=float, default=TIME_THRESHOLD, help=f"Allowed slowdown (default {TIME_THRESHOLD}).")
+    parser.add_argument("--memoryThreshold", type=float, default=MEMORY_THRESHOLD, help=f"Allowed peak memory growth (default {MEMORY_THRESHOLD}).")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.TemporaryDirectory()
+    cases = [parse_case(int(size), tmp_dir.name) for size in args.sizes.split(",") if size]
+    cases += [parse_lines_case(tmp_dir.name)] + encode_cases() + [band_lookup_case(), policy_plan_case(), switch_cycle_case()]
+    if args.only:
+        wanted = set(args.only.split(","))
+        cases = [case for case in cases if case.name in wanted]
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines, "r") as f:
+            baselines = json.load(f)
+
+    results = {}
+    problems = []
+    try:
+        for case in cases:
+            result = measure(case, args.repeats)
+            results[case.name] = result
+            extras = ", ".join(f"{key} {value}" for key, value in result.items()
+                               if key not in ("seconds", "unit", "per_second", "peak_kb", "leaked_blocks"))
+            line = (f"{case.name:24s} {result['seconds']:9.4f} s  {result['per_second']:14,.0f} {case.unit}/s  "
+                    f"peak {result['peak_kb']:9.1f} KB  {result['leaked_blocks']:6d} blocks leaked")
+            print(line + (f"  ({extras})" if extras else ""))
+            baseline = baselines.get("results", {}).get(case.name)
+            if baseline and not args.update:
+                problems += regressions(case.name, result, baseline, args.timeThreshold, args.memoryThreshold)
+    finally:
+        tmp_dir.cleanup()
+
+    if args.update:
+        recorded = baselines.get("results", {})
+        recorded.update(results)
+        baselines = {"machine": platform.platform(), "python": platform.python_version(), "results": recorded}
+        with open(args.baselines, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baselines written to {args.baselines}")
+    elif problems:
+        print("\nRegressions:")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    elif baselines:
+        print("\nNo regressions against the baselines.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Writes synthetic WSJT-X ALL.TXT files for the benchmarks.
+
+Lines mix the "Rx" and "MHz" formats, Tx lines, decodes with and without a grid,
+and the other message shapes WSJT-X logs, with timestamps spread evenly over
+span_hours and ending at end_time.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+BANDS_MHZ = ["1.840", "3.573", "5.357", "7.074", "10.136", "14.074", "18.100", "21.074", "24.915", "28.074", "50.313"]
+CALLS = ["K1ABC", "W1AW", "JA1XYZ", "DL2ABC", "VK3DEF", "G4XYZ", "PY2ABC", "ZL1AB", "VE3XYZ", "EA8/DL1ABC", "KH6/K1ABC"]
+GRIDS = ["FN42", "EN35", "PM95", "JO62", "QF22", "IO91", "GG66", "RF72", "FN03"]
+AVERAGE_LINE_BYTES = 62
+
+
+def make_line(rng, stamp, freq):
+    """One ALL.TXT line for the given "YYMMDD_HHMMSS" stamp."""
+    kind = rng.random()
+    snr = rng.randint(-24, 20)
+    dt = f"{rng.uniform(-0.5, 1.5):.1f}"
+    audio = rng.randint(200, 2900)
+    call = rng.choice(CALLS)
+    if kind < 0.05:
+        return f"{stamp}  {freq:>8} Tx FT8      0  0.0 {audio:4d} {rng.choice(CALLS)} N0MQL EN35\n"
+    if kind < 0.50:
+        tail = f"{call} {rng.choice(GRIDS)}"
+    elif kind < 0.65:
+        tail = f"CQ {call} {rng.choice(GRIDS)}"
+    elif kind < 0.80:
+        tail = f"{call} {rng.choice(CALLS)} {snr:+03d}"
+    elif kind < 0.90:
+        tail = call
+    else:
+        tail = f"{call} {rng.choice(CALLS)} RR73"
+    if rng.random() < 0.5:
+        return f"{stamp} {freq:>8} Rx FT8 {snr:6d} {dt:>4} {audio:4d} {tail}\n"
+    return f"{stamp}  {freq} MHz  FT8  {snr} {dt:>4}  {audio} {tail}\n"
+
+
+def corpus(count=2000, seed=1):
+    """A list of representative lines, for checking parsers against each other."""
+    rng = random.Random(seed)
+    start = datetime(2025, 12, 22, 5, 20, tzinfo=timezone.utc)
+    lines = []
+    for i in range(count):
+        stamp = (start + timedelta(seconds=15 * (i // 8))).strftime("%y%m%d_%H%M%S")
+        lines.append(make_line(rng, stamp, rng.choice(BANDS_MHZ)))
+    # Odd lines seen in the wild
+    lines += [
+        "\n",
+        "garbage\n",
+        "251322_052015  14.074 Rx FT8    -12  0.3 1245 K1ABC FN42\n",  # month 13
+        "251222_056015  14.074 Rx FT8    -12  0.3 1245 K1ABC FN42\n",  # second 60
+        "251222_052015  14.074 Rx FT8    -12  0.3 1245 <K1ABC> FN42\n",
+        "251222_052015  14.074 Rx FT8    -12  0.3 1245 K1ABC; fn42\n",
+        "251222_052015  14.074 Rx FT8    -12  0.3 1245 K1ABC fn42\n",
+        "251222_052015  14.074 Rx FT8    -12  0.3 1245 K1ABC\n",
+        "251222_052015  14.074 Rx FT8    -12  0.3 124x K1ABC FN42\n",
+        "  251222_052015  14.074 Rx FT8    -12  0.3 1245 K1ABC FN42  \n",
+        "251222_052015  14.074 MHz  Rx FT8  -12  0.8  1245 K1ABC FN42\n",
+        "251222_052015\t14.074\tRx\tFT8\t-12\t0.3\t1245\tK1ABC\tFN42\n",
+        "251222_052015  14.074 Rx FT4    -12 -0.3 1245 K1ABC FN42\n",
+        "251222_052015  14.074 Rx FT8    +12  0.3 1245 K1ABC FN42\n",
+        "691222_052015  14.074 Rx FT8    -12  0.3 1245 K1ABC FN42\n",
+        "681222_052015  14.074 Rx FT8    -12  0.3 1245 K1ABC FN42\n",
+    ]
+    return lines
+
+
+def write_synthetic_all_txt(path, size_bytes, end_time=None, span_hours=72, seed=1):
+    """Write about size_bytes of ALL.TXT lines to path. Returns the number of lines written."""
+    rng = random.Random(seed)
+    if end_time is None:
+        end_time = datetime.now(timezone.utc)
+    line_count = max(1, size_bytes // AVERAGE_LINE_BYTES)
+    start = end_time - timedelta(hours=span_hours)
+    step = span_hours * 3600 / line_count
+    written = 0
+    stamp_second = None
+    stamp = None
+    freq = rng.choice(BANDS_MHZ)
+    with open(path, "w") as f:
+        buffer = []
+        for i in range(line_count):
+            second = int(i * step)
+            if second != stamp_second:
+                stamp_second = second
+                stamp = (start + timedelta(seconds=second)).strftime("%y%m%d_%H%M%S")
+                if rng.random() < 0.01:
+                    freq = rng.choice(BANDS_MHZ)
+            buffer.append(make_line(rng, stamp, freq))
+            if len(buffer) >= 10000:
+                f.writelines(buffer)
+                buffer = []
+            written += 1
+        f.writelines(buffer)
+    return written
@@ -0,0 +1,92 @@
+"""
+Sends spots through the uploader's encoder and sender to IPFIXCollector, and checks
+that every record decodes back to the spot it came from.
+
+    python3 benchmarks/UploadBenchmark.py --spots 20000
+
+Reports records/sec and bytes/record on the wire, one packet per spot against
+--batch packing, with the sender's pacing turned off. Exits non-zero if a record is
+lost, malformed or decodes to anything but its spot.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import WSJTXToPSKReporter as reporter
+from EncoderBenchmark import make_spots
+from IPFIXCollector import IPFIXCollector
+from PSKReporterSender import PSKReporterSender
+
+UNPACED = 1e9  # Packets per second, i.e. no pacing
+
+
+def expected_record(spot):
+    return {
+        "receiver_callsign": reporter.RECEIVER_CALLSIGN,
+        "receiver_locator": reporter.RECEIVER_LOCATOR,
+        "receiver_antenna": reporter.RECEIVER_ANTENNA,
+        "receiver_rig": reporter.RECEIVER_RIG,
+        "sender_callsign": spot.sender_callsign,
+        "sender_locator": spot.sender_locator,
+        "frequency": int(spot.frequency),
+        "mode": spot.mode,
+        "software": reporter.SOFTWARE_NAME,
+        "software_version": reporter.SOFTWARE_VERSION,
+        "timestamp": int(spot.timestamp),
+    }
+
+
+def upload(name, spots, packets_for):
+    collector = IPFIXCollector("127.0.0.1", 0, keep_records=True)
+    host, port = collector.start()
+    sender = PSKReporterSender(host, port, rate=UNPACED, burst=UNPACED)
+    start = time.perf_counter()
+    sender.send(reporter.create_template_packet(0))
+    sent = 1
+    for packet in packets_for(spots):
+        sender.send(packet)
+        sent += 1
+    sender.flush()
+    arrived = collector.wait_for(sent)
+    seconds = time.perf_counter() - start
+    sender.close()
+    collector.shutdown()
+    collector.server_close()
+
+    print(f"{name:16s} {len(spots) / seconds:10,.0f} records/s end to end   {collector.summary()}")
+    ok = arrived and not collector.malformed and not collector.gaps
+    if [expected_record(spot) for spot in spots] != collector.records:
+        print(f"{name}: decoded records don't match the spots sent")
+        ok = False
+    for problem in collector.problems:
+        print(f"  {problem}")
+    return ok
+
+
+def one_per_spot(spots):
+    for sequence_number, spot in enumerate(spots, 1):
+        yield reporter.create_data_packet(sequence_number, [spot])
+
+
+def batched(spots):
+    for packet, count in reporter.get_encoder().data_packets(1, spots, reporter.MAX_PACKET_BYTES):
+        yield packet
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload spots to a local IPFIX collector and check what arrives.")
+    parser.add_argument("--spots", type=int, default=20000, help="Spots to send each way (default 20000).")
+    args = parser.parse_args()
+
+    spots = make_spots(args.spots)
+    ok = upload("One per spot", spots, one_per_spot)
+    ok = upload("Batched", spots, batched) and ok
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
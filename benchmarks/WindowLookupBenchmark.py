@@ -0,0 +1,70 @@
+"""
+Compares the binary-search window lookup in parse_all_txt with a full scan of ALL.TXT.
+
+    python3 benchmarks/WindowLookupBenchmark.py              # synthetic 1 GB log
+    python3 benchmarks/WindowLookupBenchmark.py --sizeMB 100
+    python3 benchmarks/WindowLookupBenchmark.py --path ~/.local/share/WSJT-X/ALL.TXT
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import WSJTXToPSKReporter
+from SyntheticAllTxt import write_synthetic_all_txt
+
+
+def full_scan(file_path, minutes_ago):
+    """What parse_all_txt used to do: parse every line, then filter by time."""
+    since = datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)
+    with open(file_path, "r") as f:
+        return WSJTXToPSKReporter.parse_lines(f, since)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ALL.TXT time-window lookup against a full scan.")
+    parser.add_argument("--sizeMB", type=int, default=1024, help="Size of the synthetic log to generate (default 1024).")
+    parser.add_argument("--path", help="Benchmark an existing ALL.TXT instead of generating one.")
+    parser.add_argument("--minutes", type=int, default=60, help="Window to look up (default 60).")
+    args = parser.parse_args()
+
+    tmp_dir = None
+    path = args.path
+    if not path:
+        tmp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp_dir.name, "ALL.TXT")
+        print(f"Writing a {args.sizeMB} MB synthetic ALL.TXT...")
+        lines = write_synthetic_all_txt(path, args.sizeMB * 1024 * 1024)
+        print(f"Wrote {lines} lines ({os.path.getsize(path) / 1e6:.0f} MB).")
+
+    try:
+        window_time, window_spots = timed(WSJTXToPSKReporter.parse_all_txt, path, args.minutes)
+        scan_time, scan_spots = timed(full_scan, path, args.minutes)
+
+        # The scan ran later, so its window starts a little later: its spots must be
+        # exactly the tail of the window lookup's spots
+        same = window_spots[len(window_spots) - len(scan_spots):] == scan_spots
+
+        print(f"\nFull scan:     {scan_time:8.3f} s  {len(scan_spots)} spots")
+        print(f"Window lookup: {window_time:8.3f} s  {len(window_spots)} spots")
+        print(f"Speedup:       {scan_time / window_time:8.1f}x")
+        print(f"Same spots:    {'yes' if same else 'NO'}")
+        if not same:
+            sys.exit(1)
+    finally:
+        if tmp_dir:
+            tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()